@@ -0,0 +1,125 @@
+import time
+from collections import Counter
+from hashlib import md5
+from math import ceil
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+USERS_NAMESPACE = 'users'
+
+
+def reviews_namespace(title_id):
+    return f'reviews:{title_id}'
+
+
+def comments_namespace(review_id):
+    return f'comments:{review_id}'
+
+
+def new_version():
+    return uuid4().hex, time.time()
+
+
+def get_version(namespace):
+    """Текущая версия пространства имён: (метка, время изменения)."""
+    key = f'{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Делает недействительными все записи пространства имён."""
+    cache.set(f'{namespace}:version', new_version(), None)
+
+
+class TitleListCache:
+    """Кэш сериализованных страниц списка произведений.
+
+    Ключ строится из нормализованных параметров запроса (фильтры,
+    сортировка, страница, курсор) и версии пространства имён, которую
+    сбрасывают сигналы моделей.
+
+    Счётчики попаданий и промахов ведутся в памяти процесса: запись
+    в общий кэш на каждое чтение стоила бы дороже самого попадания.
+    """
+    namespace = 'titles'
+
+    def __init__(self):
+        self.counters = Counter()
+
+    def make_key(self, request):
+        params = sorted(
+            (name, tuple(sorted(values)))
+            for name, values in request.query_params.lists()
+            if any(values) or name == 'cursor'
+        )
+        raw = repr((request.build_absolute_uri('/'), params))
+        digest = md5(raw.encode()).hexdigest()
+        version, _ = get_version(self.namespace)
+        return f'{self.namespace}:{version}:list:{digest}'
+
+    def get(self, key):
+        data = cache.get(key)
+        self.count('hits' if data is not None else 'misses')
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, settings.TITLES_CACHE_TIMEOUT)
+
+    def invalidate(self):
+        bump_version(self.namespace)
+
+    def count(self, counter):
+        self.counters[counter] += 1
+
+    def stats(self):
+        """Попадания и промахи в этом процессе."""
+        return {'hits': self.counters['hits'],
+                'misses': self.counters['misses']}
+
+
+title_list_cache = TitleListCache()
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list/retrieve по версиям кэша.
+
+    Валидаторы считаются по версиям пространств имён из
+    get_cache_namespaces(), поэтому ответ 304 отдаётся без обращения
+    к базе и сериализаторам.
+    """
+
+    def get_cache_namespaces(self):
+        raise NotImplementedError
+
+    def conditional(self, handler, request, *args, **kwargs):
+        versions = [get_version(namespace)
+                    for namespace in self.get_cache_namespaces()]
+        raw = repr((
+            [version for version, _ in versions],
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT'),
+        ))
+        etag = f'"{md5(raw.encode()).hexdigest()}"'
+        last_modified = ceil(max(modified for _, modified in versions))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
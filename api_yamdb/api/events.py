@@ -0,0 +1,170 @@
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from reviews.models import Title
+
+OVERFLOW = object()
+
+EVENTS_PATH = re.compile(r'^/api/v1/titles/(?P<title_id>\d+)/events/$')
+
+
+class Subscription:
+    """Очередь событий одного подписчика.
+
+    Очередь ограничена EVENTS_QUEUE_SIZE: если клиент не успевает читать,
+    накопленные события выбрасываются и вместо них кладётся OVERFLOW,
+    после которого поток закрывается, а клиент перечитывает отзывы.
+    """
+
+    def __init__(self, title_id, loop):
+        self.title_id = title_id
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """Внутрипроцессная рассылка событий по произведениям.
+
+    publish вызывается из синхронного кода (сигналы моделей, потоки
+    обработки запросов), поэтому события передаются в цикл событий
+    подписчика через call_soon_threadsafe. Подписчики других процессов
+    события не получают.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, title_id):
+        subscription = Subscription(title_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions[title_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions[subscription.title_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscriptions[subscription.title_id]
+
+    def count(self, title_id):
+        with self.lock:
+            return len(self.subscriptions.get(title_id, ()))
+
+    def publish(self, title_id, event, data):
+        with self.lock:
+            subscribers = list(self.subscriptions.get(title_id, ()))
+        if not subscribers:
+            return
+        message = (
+            f'event: {event}\n'
+            f'data: {json.dumps(data, cls=JSONEncoder, ensure_ascii=False)}'
+            '\n\n'
+        ).encode()
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.push, message)
+            except RuntimeError:
+                # цикл подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+
+event_hub = EventHub()
+
+
+def publish_on_commit(title_id, event, serializer):
+    """Отправляет событие после фиксации транзакции; данные
+    сериализуются, только если у произведения есть подписчики."""
+    def publish():
+        if event_hub.count(title_id):
+            event_hub.publish(title_id, event, serializer.data)
+    transaction.on_commit(publish)
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def title_events(scope, receive, send, title_id):
+    """Поток Server-Sent Events о новых отзывах и комментариях
+    произведения."""
+    exists = await sync_to_async(
+        Title.objects.filter(pk=title_id).exists)()
+    if not exists:
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body',
+                    'body': b'{"detail":"Not found."}'})
+        return
+    subscription = event_hub.subscribe(title_id)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b': connected\n\n',
+                    'more_body': True})
+        while True:
+            message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {message, disconnect}, timeout=settings.EVENTS_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED)
+            if message not in done:
+                message.cancel()
+                if disconnect in done:
+                    return
+                await send({'type': 'http.response.body',
+                            'body': b': keepalive\n\n', 'more_body': True})
+            elif message.result() is OVERFLOW:
+                await send({'type': 'http.response.body',
+                            'body': b'event: overflow\ndata: {}\n\n'})
+                return
+            else:
+                await send({'type': 'http.response.body',
+                            'body': message.result(), 'more_body': True})
+    finally:
+        disconnect.cancel()
+        event_hub.unsubscribe(subscription)
+
+
+def with_title_events(application):
+    """Оборачивает ASGI-приложение Django: запросы к
+    /api/v1/titles/{id}/events/ обслуживаются потоком событий."""
+
+    async def router(scope, receive, send):
+        match = None
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = EVENTS_PATH.match(scope['path'])
+        if match is None:
+            return await application(scope, receive, send)
+        return await title_events(scope, receive, send,
+                                  int(match['title_id']))
+
+    return router
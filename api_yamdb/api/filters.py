@@ -1,6 +1,8 @@
 from django_filters import rest_framework as filters
 
-from reviews.models import Title
+from reviews.denormalized import genre_title_copies
+from reviews.models import Review, Title
+from reviews.search import review_index, title_index
 
 
 class TitleFilter(filters.FilterSet):
@@ -9,12 +11,37 @@ class TitleFilter(filters.FilterSet):
         field_name='category__slug',
     )
     genre = filters.CharFilter(
-        field_name='genre__slug',
+        method='filter_genre',
     )
     name = filters.CharFilter(
         field_name='name',
     )
+    search = filters.CharFilter(
+        method='filter_search',
+    )
 
     class Meta:
         model = Title
-        fields = ('category', 'genre', 'name', 'year')
+        fields = ('category', 'genre', 'name', 'year', 'search')
+
+    def filter_genre(self, queryset, name, value):
+        # ключ пагинации берётся из строки жанра: выборка идёт по её
+        # индексу, а не сортирует все произведения жанра
+        return genre_title_copies.alias_keys(
+            queryset.filter(genre__slug=value), 'title_through')
+
+    def filter_search(self, queryset, name, value):
+        return title_index.search(queryset, value)
+
+
+class ReviewFilter(filters.FilterSet):
+    search = filters.CharFilter(
+        method='filter_search',
+    )
+
+    class Meta:
+        model = Review
+        fields = ('search',)
+
+    def filter_search(self, queryset, name, value):
+        return review_index.search(queryset, value)
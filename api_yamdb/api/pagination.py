@@ -0,0 +1,168 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Постраничная выдача с опциональным режимом курсора.
+
+    Без параметра `cursor` работает обычная нумерация страниц. С параметром
+    `cursor` (пустое значение — первая страница) выборка идёт по ключу
+    `ordering` без OFFSET и COUNT(*), поэтому стоимость страницы не зависит
+    от её глубины.
+
+    Параметры из ordered_params задают свой порядок строк (поиск по
+    релевантности, сортировка): курсор с ними отклоняется, а не молча
+    подменяет их порядок своим ключом.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering = ('id',)
+    ordered_params = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        conflicts = [name for name in self.ordered_params
+                     if name in request.query_params]
+        if conflicts:
+            raise APIValidationError({self.cursor_query_param: [
+                f'Курсор нельзя сочетать с параметрами: '
+                f'{", ".join(conflicts)}.']})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.get_ordering(queryset)
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self.get_position(results[-1])
+        if results and (has_more or not reverse) and position is not None:
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_ordering(self, queryset):
+        """Ключ ordering для queryset. Если фильтр задал псевдоним
+        `<поле>_key` (копию поля из присоединённой таблицы), ключ берёт
+        его, и сортировка идёт по индексу этой таблицы."""
+        ordering = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if f'{name}_key' in queryset.query.annotations:
+                field = field.replace(name, f'{name}_key')
+            ordering.append(field)
+        return tuple(ordering)
+
+    def order_queryset(self, queryset):
+        return queryset.order_by(*self.get_ordering(queryset))
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """Условие «строка идёт после position» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-'))
+                for field in self.ordering]
+
+    def get_link_after(self, url, instance):
+        """Ссылка в режиме курсора на страницу url, идущую после instance."""
+        self.base_url = url
+        return self.encode_cursor(self.get_position(instance), reverse=False)
+
+    def encode_cursor(self, position, reverse):
+        payload = {
+            'p': [str(value) for value in position],
+            'r': int(reverse),
+        }
+        token = b64encode(json.dumps(payload).encode()).decode()
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(b64decode(token.encode(), validate=True))
+            raw_position = payload['p']
+            reverse = bool(payload['r'])
+            if len(raw_position) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, raw_position)
+            ]
+        except (BinasciiError, KeyError, TypeError, ValueError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+
+class TitlePagination(KeysetPagination):
+    ordering = ('name', 'id')
+    ordered_params = ('search', 'ordering')
+
+
+class TopTitlePagination(KeysetPagination):
+    ordering = ('-rating', 'id')
+
+
+class PubDatePagination(KeysetPagination):
+    ordering = ('-pub_date', '-id')
+    ordered_params = ('search',)
@@ -1,11 +1,16 @@
 from django.core.validators import RegexValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueValidator
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import (SCORES, Category, Comment, Genre, Review, Title,
+                            score_field)
 from users.models import User
 from .validators import validate_username
 
+SCORE_FIELDS = tuple(score_field(score) for score in SCORES)
+
 
 class GenreSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,50 +37,101 @@ class TitlesCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        exclude = ('score_sum', 'reviews_count', 'rating', 'weighted_rating',
+                   *SCORE_FIELDS)
+
+
+class TitleBulkItemSerializer(serializers.ModelSerializer):
+    """Элемент массового создания произведений.
+
+    Жанры и категория принимаются слагами без обращения к базе: они
+    разрешаются одним запросом на весь пакет.
+    """
+    genre = serializers.ListField(child=serializers.SlugField(),
+                                  required=False)
+    category = serializers.SlugField()
+
+    class Meta:
+        model = Title
+        fields = ('name', 'year', 'description', 'genre', 'category')
 
 
 class ReadTitleSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     genre = GenreSerializer(read_only=True, many=True)
     rating = serializers.FloatField(read_only=True)
+    weighted_rating = serializers.FloatField(read_only=True)
+    scores = serializers.DictField(source='score_distribution',
+                                   child=serializers.IntegerField(),
+                                   read_only=True)
 
     class Meta:
         model = Title
-        fields = "__all__"
+        exclude = ('score_sum', 'reviews_count', *SCORE_FIELDS)
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class CommentSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField(
         read_only=True
     )
 
     class Meta:
-        model = Review
+        model = Comment
         fields = (
-            'id', 'text', 'author', 'score', 'pub_date')
-
-    def validate(self, data):
-        if not self.context.get('request').method == 'POST':
-            return data
-        author = self.context.get('request').user
-        title_id = self.context.get('view').kwargs.get('title_id')
-        if Review.objects.filter(author=author, title=title_id).exists():
-            raise serializers.ValidationError(
-                'Вы уже оставляли отзыв на это произведение'
-            )
-        return data
+            'id', 'text', 'author', 'pub_date')
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class ReviewSerializer(serializers.ModelSerializer):
+    """Отзыв; если в контексте передан comments_limit, дополняется
+    числом комментариев и последними комментариями."""
     author = serializers.StringRelatedField(
         read_only=True
     )
+    comments_count = serializers.IntegerField(read_only=True)
+    latest_comments = CommentSerializer(many=True, read_only=True)
 
     class Meta:
-        model = Comment
+        model = Review
         fields = (
-            'id', 'text', 'author', 'pub_date')
+            'id', 'text', 'author', 'score', 'pub_date',
+            'comments_count', 'latest_comments')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get('comments_limit') is None:
+            del self.fields['comments_count']
+            del self.fields['latest_comments']
+
+    def create(self, validated_data):
+        try:
+            # точка сохранения: после ошибки вставки транзакция
+            # остаётся пригодной для проверки повторного отзыва
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(
+                author=validated_data['author'],
+                title=validated_data['title'],
+            ).exists():
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Вы уже оставляли отзыв на это произведение'
+                ]
+            })
+
+
+class ReviewBatchItemSerializer(serializers.ModelSerializer):
+    """Элемент пакетной отправки отзывов.
+
+    Произведение принимается числовым id без обращения к базе: наличие
+    произведений и повторные отзывы проверяются одним запросом на пакет.
+    """
+    title = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Review
+        fields = ('title', 'text', 'score')
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
+from users.models import User
+from .cache import (USERS_NAMESPACE, bump_version, comments_namespace,
+                    reviews_namespace, title_list_cache)
+from .events import publish_on_commit
+from .serializers import CommentSerializer, ReviewSerializer
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+@receiver(m2m_changed, sender=GenreTitle)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_title_list(sender, **kwargs):
+    transaction.on_commit(title_list_cache.invalidate)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_reviews(sender, instance, **kwargs):
+    namespace = reviews_namespace(instance.title_id)
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    """Сдвигает агрегаты рейтинга на новую или изменённую оценку."""
+    loaded = getattr(instance, 'loaded_rating', None)
+    current = (instance.title_id, instance.score)
+    instance.loaded_rating = current
+    if loaded == current:
+        return
+    if not created and loaded is None:
+        # прежняя оценка неизвестна: агрегаты считаются заново
+        Title.objects.filter(pk=instance.title_id).recalculate_rating()
+        return
+    if loaded is not None:
+        Title.objects.filter(pk=loaded[0]).update_rating(removed=[loaded[1]])
+    Title.objects.filter(pk=instance.title_id).update_rating(
+        added=[instance.score])
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    # и при каскадном удалении вместе с автором или произведением
+    title_id, score = getattr(instance, 'loaded_rating',
+                              (instance.title_id, instance.score))
+    Title.objects.filter(pk=title_id).update_rating(removed=[score])
+
+
+@receiver(post_save, sender=Review)
+def publish_review(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(instance.title_id, 'review',
+                          ReviewSerializer(instance))
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(instance.review.title_id, 'comment',
+                          CommentSerializer(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    namespaces = [comments_namespace(instance.review_id)]
+    # CommentViewSet передаёт отзыв с комментарием: тогда произведение
+    # известно без запроса
+    if Comment._meta.get_field('review').is_cached(instance):
+        title_id = instance.review.title_id
+    else:
+        title_id = Review.objects.filter(
+            pk=instance.review_id).values_list('title_id', flat=True).first()
+    if title_id is not None:
+        # превью комментариев входит в список отзывов произведения
+        namespaces.append(reviews_namespace(title_id))
+    transaction.on_commit(
+        lambda: [bump_version(namespace) for namespace in namespaces])
+
+
+@receiver(post_save, sender=User)
+def invalidate_authors(sender, instance, created, **kwargs):
+    # имена авторов входят в списки отзывов и комментариев; у нового
+    # пользователя их ещё нет
+    renamed = not created and instance.username != getattr(
+        instance, 'loaded_username', None)
+    instance.loaded_username = instance.username
+    if not renamed:
+        return
+    transaction.on_commit(lambda: bump_version(USERS_NAMESPACE))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(USERS_NAMESPACE))
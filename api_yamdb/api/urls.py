@@ -2,8 +2,8 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    GetTokenViewSet, ReviewViewSet, TitlesViewSet,
-                    UserRegister, UserViewSet)
+                    GetTokenViewSet, ReviewBatchView, ReviewViewSet,
+                    TitlesViewSet, UserRegister, UserViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register('titles', TitlesViewSet)
@@ -22,6 +22,8 @@ v1_router.register(
 
 urlpatterns = [
     path('v1/', include(v1_router.urls)),
+    path('v1/reviews/batch/', ReviewBatchView.as_view(),
+         name='reviews-batch'),
     path('v1/auth/signup/', UserRegister.as_view(), name='register'),
     path('v1/auth/token/', GetTokenViewSet.as_view({'post': 'create'}),
          name='token'),
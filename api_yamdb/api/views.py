@@ -1,27 +1,42 @@
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import Avg
-
 
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
 from users.models import User
-from .filters import TitleFilter
+from .cache import (USERS_NAMESPACE, ConditionalGetMixin, bump_version,
+                    comments_namespace, reviews_namespace, title_list_cache)
+from .events import publish_on_commit
+from .filters import ReviewFilter, TitleFilter
+from .pagination import (PubDatePagination, TitlePagination,
+                         TopTitlePagination)
 from .permissions import (IsAdmin,
                           IsSuperUserIsAdminIsModeratorIsAuthor,
                           IsSuperUserOrIsAdminOrReadOnly,
                           IsUserIsModeratorIsAdmin)
 from .serializers import (CategorySerializer, CommentSerializer,
                           GenreSerializer, GetTokenSerializer,
-                          ReadTitleSerializer, ReviewSerializer,
-                          TitlesCreateSerializer, UserMeEditSerializer,
+                          ReadTitleSerializer, ReviewBatchItemSerializer,
+                          ReviewSerializer,
+                          TitleBulkItemSerializer, TitlesCreateSerializer,
+                          UserMeEditSerializer,
                           UserRegisterSerializer, UserSerializer)
 
 
@@ -49,54 +64,461 @@ class CategoryViewSet(mixins.CreateModelMixin,
     lookup_field = 'slug'
 
 
-class TitlesViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.all().annotate(rating=Avg(
-        'reviews__score')).order_by('name')
+def validate_items(serializer_class, data, **kwargs):
+    """Проверяет элементы пакета по отдельности.
+
+    Возвращает словарь {индекс: validated_data} и список ошибок вида
+    {'index': индекс, 'errors': {...}}.
+    """
+    valid, errors = {}, []
+    for index, item in enumerate(data):
+        serializer = serializer_class(data=item, **kwargs)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    return valid, errors
+
+
+def resolve_title_slugs(items):
+    """Заменяет слаги жанров и категорий на id, по запросу на таблицу.
+
+    Элементы со ссылками на несуществующие слаги удаляются из items,
+    ошибки по ним возвращаются списком.
+    """
+    genres = dict(Genre.objects.filter(slug__in={
+        slug for item in items.values() for slug in item.get('genre', ())
+    }).values_list('slug', 'id'))
+    categories = dict(Category.objects.filter(slug__in={
+        item['category'] for item in items.values()
+    }).values_list('slug', 'id'))
+    errors = []
+    for index, item in list(items.items()):
+        item_errors = {}
+        missing = [slug for slug in item.get('genre', ())
+                   if slug not in genres]
+        if missing:
+            item_errors['genre'] = [
+                f'Жанры не найдены: {", ".join(missing)}']
+        if item['category'] not in categories:
+            item_errors['category'] = [
+                f'Категория не найдена: {item["category"]}']
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+            del items[index]
+    return genres, categories, errors
+
+
+def next_free_id(model):
+    """Первый свободный id модели для назначения id до bulk_create.
+
+    Транзакция SQLite по умолчанию отложенная: чтение Max('id') не
+    блокирует запись, и два параллельных пакета получили бы одни и те же
+    id. Пустой UPDATE перед чтением берёт блокировку записи, поэтому
+    второй пакет ждёт фиксации первого и читает уже его id.
+
+    Последний выданный id читается из sqlite_sequence: Max('id') вернул
+    бы id удалённой последней строки повторно. Если строки в
+    sqlite_sequence ещё нет, берётся Max('id').
+    """
+    if connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(model._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {column} = {column} WHERE 0')
+            cursor.execute(
+                f'SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence '
+                f'WHERE name = %s), 0), COALESCE(MAX({column}), 0)) '
+                f'FROM {table}',
+                [model._meta.db_table])
+            return cursor.fetchone()[0] + 1
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def batch_error(data, message):
+    """Ответ 400, если тело пакета не список или в нём больше
+    BULK_MAX_ITEMS элементов; иначе None."""
+    if not isinstance(data, list):
+        return Response({'message': message},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(data) > settings.BULK_MAX_ITEMS:
+        return Response(
+            {'message': f'В пакете не больше {settings.BULK_MAX_ITEMS} '
+                        'элементов'},
+            status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+@transaction.atomic
+def bulk_create_titles(items, genres, categories):
+    """Вставляет произведения и связи с жанрами через bulk_create.
+
+    SQLite не возвращает id из bulk_create, поэтому id назначаются
+    заранее внутри транзакции, под блокировкой записи.
+    """
+    first_id = next_free_id(Title)
+    titles, links, created = [], [], []
+    for title_id, item in enumerate(items, first_id):
+        item = dict(item)
+        genre_slugs = list(dict.fromkeys(item.pop('genre', ())))
+        category = item.pop('category')
+        titles.append(Title(id=title_id, category_id=categories[category],
+                            **item))
+        links.extend(GenreTitle(title_id=title_id, genre_id=genres[slug])
+                     for slug in genre_slugs)
+        created.append({'id': title_id, **item,
+                        'genre': genre_slugs, 'category': category})
+    Title.objects.bulk_create(titles)
+    GenreTitle.objects.bulk_create(links)
+    transaction.on_commit(title_list_cache.invalidate)
+    return created
+
+
+def check_review_batch(items, author):
+    """Проверяет пакет отзывов двумя запросами на весь пакет.
+
+    Из items удаляются элементы с несуществующим произведением, с уже
+    оставленным автором отзывом и повторы произведения внутри пакета;
+    ошибки по ним возвращаются списком.
+    """
+    title_ids = {item['title'] for item in items.values()}
+    existing = set(Title.objects.filter(
+        pk__in=title_ids).values_list('pk', flat=True))
+    reviewed = set(Review.objects.filter(
+        author=author, title_id__in=title_ids
+    ).values_list('title_id', flat=True))
+    errors = []
+    for index, item in list(items.items()):
+        title_id = item['title']
+        if title_id not in existing:
+            message = f'Произведение не найдено: {title_id}'
+        elif title_id in reviewed:
+            message = 'Вы уже оставляли отзыв на это произведение'
+        else:
+            reviewed.add(title_id)
+            continue
+        errors.append({'index': index, 'errors': {
+            api_settings.NON_FIELD_ERRORS_KEY: [message]}})
+        del items[index]
+    return errors
+
+
+@transaction.atomic
+def bulk_create_reviews(items, author):
+    """Вставляет отзывы одним bulk_create и обновляет агрегаты рейтинга
+    одним UPDATE на каждое затронутое произведение.
+
+    id назначаются заранее, как в bulk_create_titles.
+    """
+    first_id = next_free_id(Review)
+    reviews = [
+        Review(id=review_id, author=author, title_id=item['title'],
+               text=item['text'], score=item['score'])
+        for review_id, item in enumerate(items, first_id)
+    ]
+    Review.objects.bulk_create(reviews)
+    scores = defaultdict(list)
+    for review in reviews:
+        scores[review.title_id].append(review.score)
+    for title_id, added in scores.items():
+        Title.objects.filter(pk=title_id).update_rating(added=added)
+
+    # bulk_create не отправляет post_save, кэш сбрасывается вручную
+    namespaces = [reviews_namespace(title_id) for title_id in scores]
+    transaction.on_commit(title_list_cache.invalidate)
+    transaction.on_commit(
+        lambda: [bump_version(namespace) for namespace in namespaces])
+    for review in reviews:
+        publish_on_commit(review.title_id, 'review',
+                          ReviewSerializer(review))
+    return reviews
+
+
+def attach_comment_previews(reviews, limit):
+    """Добавляет к отзывам comments_count и limit последних комментариев.
+
+    Число запросов не зависит от количества отзывов: один сгруппированный
+    запрос на счётчики и один на комментарии, где последние limit штук
+    каждого отзыва отбираются коррелированным подзапросом по индексу
+    (review, pub_date, id).
+    """
+    review_ids = [review.pk for review in reviews]
+    counts = dict(
+        Comment.objects.filter(review_id__in=review_ids).order_by()
+        .values('review_id').annotate(total=Count('pk'))
+        .values_list('review_id', 'total')
+    )
+    latest = defaultdict(list)
+    if limit and counts:
+        newest = Comment.objects.filter(
+            review_id=OuterRef('review_id')
+        ).order_by('-pub_date', '-id').values('pk')[:limit]
+        comments = Comment.objects.filter(
+            review_id__in=review_ids, pk__in=Subquery(newest)
+        ).select_related('author').only(
+            'text', 'pub_date', 'review', 'author__username'
+        ).order_by('-pub_date', '-id')
+        for comment in comments:
+            latest[comment.review_id].append(comment)
+    for review in reviews:
+        review.comments_count = counts.get(review.pk, 0)
+        review.latest_comments = latest[review.pk]
+
+
+def title_reviews(title):
+    """Отзывы произведения с автором, без лишних колонок."""
+    return title.reviews.select_related('author').only(
+        'text', 'score', 'pub_date', 'title', 'author__username')
+
+
+class TitlesViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre').order_by('name')
     permission_classes = (IsSuperUserOrIsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = TitlePagination
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = TitleFilter
     filterset_fields = ('year')
+    ordering_fields = ('name', 'year', 'rating', 'weighted_rating')
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ReadTitleSerializer
         return TitlesCreateSerializer
 
+    def get_cache_namespaces(self):
+        if self.action == 'bundle':
+            # pk из маршрута не обязательно число, а версии читаются
+            # до поиска произведения
+            pk = self.kwargs['pk']
+            if not pk.isdigit():
+                raise Http404
+            return (title_list_cache.namespace, reviews_namespace(int(pk)),
+                    USERS_NAMESPACE)
+        return (title_list_cache.namespace,)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and not any(
+                name in self.request.query_params
+                for name in self.paginator.ordered_params):
+            # список идёт в порядке ключа пагинации: с фильтром по жанру
+            # ключ читается по индексу строк жанра
+            queryset = self.paginator.order_queryset(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # проверка If-None-Match идёт до кэша страниц, чтобы и попадания
+        # в кэш отдавали ETag и 304
+        return self.conditional(self.cached_list, request, *args, **kwargs)
+
+    def cached_list(self, request, *args, **kwargs):
+        key = title_list_cache.make_key(request)
+        data = title_list_cache.get(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = super(ConditionalGetMixin, self).list(
+            request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            title_list_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @action(methods=['get', ],
+            detail=False,
+            pagination_class=TopTitlePagination)
+    def top(self, request):
+        return self.conditional(self.top_titles, request)
+
+    @action(methods=['post', ],
+            detail=False)
+    def bulk(self, request):
+        error = batch_error(request.data, 'Ожидается список произведений')
+        if error is not None:
+            return error
+        items, errors = validate_items(TitleBulkItemSerializer, request.data)
+        genres, categories, slug_errors = resolve_title_slugs(items)
+        errors = sorted(errors + slug_errors, key=lambda error: error['index'])
+        created = []
+        if items:
+            try:
+                created = bulk_create_titles(
+                    items.values(), genres, categories)
+            except IntegrityError:
+                return Response(
+                    {'message': 'Конфликт при вставке, повторите запрос'},
+                    status=status.HTTP_409_CONFLICT)
+        return Response(
+            {'created': created, 'errors': errors},
+            status=(status.HTTP_201_CREATED if created
+                    else status.HTTP_400_BAD_REQUEST))
+
+    @action(methods=['get', ],
+            detail=True)
+    def bundle(self, request, pk=None):
+        return self.conditional(self.title_bundle, request)
+
+    def title_bundle(self, request):
+        """Произведение, первая страница отзывов и последние комментарии
+        к ним фиксированным числом запросов."""
+        title = self.get_object()
+        paginator = PubDatePagination()
+        page_size = paginator.get_page_size(request)
+        reviews = list(title_reviews(title).order_by(
+            *paginator.ordering)[:page_size + 1])
+        next_link = None
+        if len(reviews) > page_size:
+            reviews = reviews[:page_size]
+            next_link = paginator.get_link_after(
+                request.build_absolute_uri(
+                    reverse('reviews-list', args=(title.pk,))),
+                reviews[-1])
+        comments_limit = settings.TITLE_BUNDLE_COMMENTS
+        attach_comment_previews(reviews, comments_limit)
+        context = self.get_serializer_context()
+        return Response({
+            'title': ReadTitleSerializer(title, context=context).data,
+            'reviews': {
+                'count': title.reviews_count,
+                'next': next_link,
+                'results': ReviewSerializer(reviews, many=True, context={
+                    **context, 'comments_limit': comments_limit
+                }).data,
+            },
+        })
+
+    def top_titles(self, request):
+        # без отзывов нет рейтинга: NULL не встаёт в курсор пагинации
+        queryset = self.paginator.order_queryset(
+            self.filter_queryset(self.get_queryset()).filter(
+                reviews_count__gte=settings.TOP_TITLES_MIN_REVIEWS,
+                rating__isnull=False))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = PubDatePagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = ReviewFilter
     permission_classes = (
         IsSuperUserIsAdminIsModeratorIsAuthor,
         permissions.IsAuthenticatedOrReadOnly
     )
 
     def get_title(self):
-        title_id = self.kwargs.get('title_id')
-        return get_object_or_404(Title, pk=title_id)
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title.objects.only('pk'), pk=self.kwargs.get('title_id'))
+        return self._title
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return title_reviews(self.get_title())
+
+    def get_cache_namespaces(self):
+        return (reviews_namespace(int(self.kwargs['title_id'])),
+                USERS_NAMESPACE)
+
+    def get_comments_limit(self):
+        """Значение ?comments=K для списка отзывов или None."""
+        value = self.request.query_params.get('comments')
+        if self.action != 'list' or value is None:
+            return None
+        limit = int(value) if value.isdigit() else -1
+        if not 0 <= limit <= settings.REVIEW_COMMENTS_PREVIEW_MAX:
+            raise ValidationError({'comments': [
+                'Ожидается целое число от 0 до '
+                f'{settings.REVIEW_COMMENTS_PREVIEW_MAX}'
+            ]})
+        return limit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['comments_limit'] = self.get_comments_limit()
+        return context
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        limit = self.get_comments_limit()
+        if page is not None and limit is not None:
+            attach_comment_previews(page, limit)
+        return page
+
+    # агрегаты рейтинга сдвигают сигналы отзыва, в той же транзакции
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user,
             title=self.get_title()
         )
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
+
+class ReviewBatchView(APIView):
+    """Пакетная отправка отзывов текущего пользователя на разные
+    произведения."""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        error = batch_error(request.data, 'Ожидается список отзывов')
+        if error is not None:
+            return error
+        items, errors = validate_items(ReviewBatchItemSerializer,
+                                       request.data)
+        errors = sorted(errors + check_review_batch(items, request.user),
+                        key=lambda error: error['index'])
+        created = []
+        if items:
+            try:
+                reviews = bulk_create_reviews(items.values(), request.user)
+            except IntegrityError:
+                return Response(
+                    {'message': 'Конфликт при вставке, повторите запрос'},
+                    status=status.HTTP_409_CONFLICT)
+            created = [
+                {'title': review.title_id, **ReviewSerializer(review).data}
+                for review in reviews
+            ]
+        return Response(
+            {'created': created, 'errors': errors},
+            status=(status.HTTP_201_CREATED if created
+                    else status.HTTP_400_BAD_REQUEST))
+
+
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    pagination_class = PubDatePagination
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
         IsSuperUserIsAdminIsModeratorIsAuthor
     )
 
     def get_review(self):
-        review_id = self.kwargs.get('review_id')
-        return get_object_or_404(Review, pk=review_id)
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.only('title'),
+                pk=self.kwargs.get('review_id'),
+                title_id=self.kwargs.get('title_id'))
+        return self._review
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return self.get_review().comments.select_related('author').only(
+            'text', 'pub_date', 'review', 'author__username')
+
+    def get_cache_namespaces(self):
+        return (comments_namespace(int(self.kwargs['review_id'])),
+                USERS_NAMESPACE)
 
     def perform_create(self, serializer):
         serializer.save(
@@ -1,3 +1,4 @@
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -81,6 +82,42 @@ DATABASES = {
 }
 
 
+# Версии пространств имён кэша сбрасываются при записи и должны быть
+# видны всем процессам сервера и команде import_csv_to_db, поэтому кэш
+# общий, а не в памяти процесса. Файловый кэш обслуживает процессы одной
+# машины; при нескольких машинах его нужно заменить на Redis или Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': Path(tempfile.gettempdir()) / 'api_yamdb_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+TITLES_CACHE_TIMEOUT = 60 * 5
+
+# Минимум отзывов, чтобы произведение попало в /api/v1/titles/top/
+TOP_TITLES_MIN_REVIEWS = 3
+
+# Априорная оценка и её вес (в отзывах) для взвешенного рейтинга
+RATING_PRIOR_MEAN = 5.5
+RATING_PRIOR_WEIGHT = 5
+
+# Сколько элементов принимают пакетные запросы за один раз
+BULK_MAX_ITEMS = 1000
+
+# Сколько последних комментариев можно запросить в ?comments= у отзывов
+REVIEW_COMMENTS_PREVIEW_MAX = 10
+
+# Сколько последних комментариев к отзыву отдаёт /api/v1/titles/{id}/bundle/
+TITLE_BUNDLE_COMMENTS = 3
+
+# Поток событий /api/v1/titles/{id}/events/ (только ASGI): длина очереди
+# подписчика и интервал keepalive-комментариев в секундах
+EVENTS_QUEUE_SIZE = 100
+EVENTS_KEEPALIVE = 15
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
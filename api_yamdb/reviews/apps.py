@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        from .denormalized import (install_copied_columns,
+                                   suspend_copied_columns)
+        from .search import install_search_indexes
+        post_migrate.connect(install_search_indexes, sender=self)
+        pre_migrate.connect(suspend_copied_columns, sender=self)
+        post_migrate.connect(install_copied_columns, sender=self)
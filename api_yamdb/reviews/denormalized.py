@@ -0,0 +1,150 @@
+from django.db import connections
+from django.db.models import F
+
+from .models import GenreTitle
+
+
+class CopiedColumns:
+    """Копии полей родительской модели в строках дочерней.
+
+    По копиям строится индекс дочерней таблицы, и выборка через неё
+    (например, произведения жанра по названию или рейтингу) идёт
+    в порядке индекса без сортировки. Копии ведут триггеры SQLite,
+    как и reviews.search.FullTextIndex; на других СУБД копий нет.
+    """
+
+    def __init__(self, model, relation, fields):
+        self.model = model
+        self.relation = relation
+        # поле дочерней модели -> поле родительской
+        self.fields = fields
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def foreign_key(self):
+        return self.model._meta.get_field(self.relation)
+
+    @property
+    def parent(self):
+        return self.foreign_key.related_model
+
+    def column_pairs(self):
+        parent_meta = self.parent._meta
+        return [(self.model._meta.get_field(copy).column,
+                 parent_meta.get_field(source).column)
+                for copy, source in self.fields.items()]
+
+    def refresh(self):
+        """UPDATE, заново копирующий поля из родительских строк."""
+        table, parent = self.table, self.parent._meta.db_table
+        parent_pk = self.foreign_key.target_field.column
+        fk = self.foreign_key.column
+        assignments = ', '.join(
+            f'{copy} = (SELECT {source} FROM {parent} '
+            f'WHERE {parent}.{parent_pk} = {table}.{fk})'
+            for copy, source in self.column_pairs())
+        return f'UPDATE {table} SET {assignments}'
+
+    def statements(self):
+        table, parent = self.table, self.parent._meta.db_table
+        pk = self.model._meta.pk.column
+        parent_pk = self.foreign_key.target_field.column
+        fk = self.foreign_key.column
+        pairs = self.column_pairs()
+        sources = ', '.join(source for _, source in pairs)
+        changed = ' OR '.join(f'old.{source} IS NOT new.{source}'
+                              for _, source in pairs)
+        copied = ', '.join(f'{copy} = new.{source}' for copy, source in pairs)
+        refresh_row = f'{self.refresh()} WHERE {pk} = new.{pk};'
+        name = self.trigger_prefix
+        return (
+            f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {table} "
+            f"BEGIN {refresh_row} END",
+            f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {fk} "
+            f"ON {table} BEGIN {refresh_row} END",
+            f"CREATE TRIGGER IF NOT EXISTS {name}_pu AFTER UPDATE OF "
+            f"{sources} ON {parent} WHEN {changed} "
+            f"BEGIN UPDATE {table} SET {copied} "
+            f"WHERE {fk} = new.{parent_pk}; END",
+        )
+
+    @property
+    def trigger_prefix(self):
+        return f'{self.table}_{self.foreign_key.column}_copy'
+
+    def triggers(self):
+        return [f'{self.trigger_prefix}_{suffix}'
+                for suffix in ('ai', 'au', 'pu')]
+
+    def suspend(self, connection):
+        """Удаляет триггеры перед массовой загрузкой: копии заполнит
+        один UPDATE в install()."""
+        with connection.cursor() as cursor:
+            for trigger in self.triggers():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+    def install(self, connection):
+        """Создаёт триггеры, если каких-то нет, и заново заполняет копии.
+
+        Уцелевшие триггеры пересоздаются вместе с остальными: миграция,
+        добавившая копию, пересоздаёт дочернюю таблицу, а триггер
+        родительской таблицы остался бы со старым списком полей.
+        """
+        triggers = self.triggers()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                triggers,
+            )
+            if cursor.fetchone()[0] == len(triggers):
+                return
+            self.suspend(connection)
+            for statement in self.statements():
+                cursor.execute(statement)
+            cursor.execute(self.refresh())
+
+    def alias_keys(self, queryset, relation):
+        """Псевдонимы `<поле>_key` для копий по уже присоединённой
+        к queryset связи relation.
+
+        Ключ пагинации берёт псевдоним вместо поля родительской модели,
+        и выборка сортируется по индексу дочерней таблицы. На других
+        СУБД копии не заполнены, и queryset возвращается как есть.
+        """
+        if connections[queryset.db].vendor != 'sqlite':
+            return queryset
+        parent_pk = self.foreign_key.target_field.name
+        return queryset.alias(**{
+            f'{source}_key': F(f'{relation}__{copy}')
+            for copy, source in self.fields.items()
+        }, **{f'{parent_pk}_key': F(f'{relation}__{self.relation}')})
+
+
+genre_title_copies = CopiedColumns(GenreTitle, 'title', {
+    'title_name': 'name',
+    'rating': 'rating',
+})
+
+
+copied_columns = (genre_title_copies,)
+
+
+def suspend_copied_columns(sender, using, **kwargs):
+    """Удаляет триггеры перед миграциями. Триггер родительской таблицы
+    ссылается на дочернюю, и SQLite не дал бы миграции пересоздать
+    дочернюю таблицу; post_migrate создаст триггеры заново."""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        for copies in copied_columns:
+            copies.suspend(connection)
+
+
+def install_copied_columns(sender, using, **kwargs):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        for copies in copied_columns:
+            copies.install(connection)
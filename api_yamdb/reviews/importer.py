@@ -0,0 +1,475 @@
+import sys
+from datetime import datetime, timezone as dt_timezone
+from hashlib import blake2b
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ImportedRow
+
+INTEGER_TYPES = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+    'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+    'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+}
+
+
+def csv_field(model, name):
+    """Поле модели для колонки CSV: `title_id` и `author` указывают
+    на внешние ключи title и author."""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        if name.endswith('_id'):
+            return model._meta.get_field(name[:-3])
+        raise
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory(children=False):
+    """Пиковый размер резидентной памяти процесса (или самого большого из
+    завершённых дочерних) в мегабайтах; None, если платформа его не
+    сообщает."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    ).ru_maxrss
+    # Linux сообщает килобайты, macOS — байты
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def batched(iterable, size):
+    """Списки по size элементов из итератора, без чтения его целиком."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def row_checksum(row):
+    """Контрольная сумма исходных значений строки CSV: 64-битное целое
+    со знаком, как BigIntegerField."""
+    digest = blake2b('\x1f'.join(row).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def parse_datetime_value(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        # fromisoformat до Python 3.11 не принимает суффикс Z
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise
+    # fromisoformat и parse_datetime дают фиксированное смещение или
+    # время без пояса
+    if settings.USE_TZ and parsed.tzinfo is None:
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class IdSet:
+    """Множество целых id в виде битовой карты: миллионы id занимают
+    мегабайты, а не гигабайты, как set.
+
+    Карта покрывает id меньше BITMAP_LIMIT (не больше 16 МБ); id за
+    пределом хранятся в обычном множестве, чтобы один огромный id
+    в CSV не занимал гигабайты памяти.
+    """
+
+    BITMAP_LIMIT = 1 << 27
+
+    def __init__(self, ids=()):
+        self.bits = bytearray()
+        self.sparse = set()
+        self.update(ids)
+
+    def add(self, value):
+        if value < 0:
+            raise ValueError(f'Отрицательный id: {value}')
+        if value >= self.BITMAP_LIMIT:
+            self.sparse.add(value)
+            return
+        byte = value >> 3
+        if byte >= len(self.bits):
+            size = min(max(byte + 1, 2 * len(self.bits)),
+                       self.BITMAP_LIMIT >> 3)
+            self.bits.extend(bytes(size - len(self.bits)))
+        self.bits[byte] |= 1 << (value & 7)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        if value >= self.BITMAP_LIMIT:
+            return value in self.sparse
+        byte = value >> 3
+        return (0 <= byte < len(self.bits)
+                and bool(self.bits[byte] & (1 << (value & 7))))
+
+
+class KnownIds:
+    """id строк родительских таблиц для проверки внешних ключей в памяти.
+
+    id читаются из базы одним запросом при первой проверке ссылки на
+    модель; id строк, записанных после этого, добавляются к множеству
+    без обращения к базе.
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def get(self, model):
+        if model not in self.ids:
+            self.ids[model] = IdSet(model._default_manager.values_list(
+                'pk', flat=True).order_by().iterator(chunk_size=10000))
+        return self.ids[model]
+
+    def add(self, model, ids):
+        if model in self.ids:
+            self.ids[model].update(ids)
+
+
+class CsvColumn:
+    """Колонка CSV: приведение строки к значению для базы и проверки
+    поля модели без обращения к базе."""
+
+    def __init__(self, name, field):
+        self.name = name
+        self.field = field
+        target = field.target_field if field.is_relation else field
+        internal_type = target.get_internal_type()
+        if internal_type in INTEGER_TYPES:
+            self.convert = int
+        elif internal_type == 'DateTimeField':
+            self.adapt = connection.ops.adapt_datetimefield_value
+            # базы без часовых поясов (SQLite, MySQL) хранят время в UTC
+            # без пояса: перевод стандартным datetime.timezone заметно
+            # дешевле make_naive с часовым поясом pytz
+            self.to_utc = (settings.USE_TZ
+                           and not connection.features.supports_timezones
+                           and connection.timezone_name == 'UTC')
+            # SQLite хранит его текстом str(datetime)
+            self.utc_text = self.to_utc and connection.vendor == 'sqlite'
+            self.convert = self.convert_datetime
+        else:
+            self.convert = str
+        self.choices = {
+            value for value, _ in field.flatchoices} if field.choices else None
+        self.validators = () if field.is_relation else field.validators
+        self.fast_clean = self.make_fast_clean()
+
+    def convert_datetime(self, value):
+        parsed = parse_datetime_value(value)
+        if (self.utc_text and parsed.tzinfo is dt_timezone.utc
+                and value[4:5] == '-' and value[13:14] == ':'
+                and value[16:17] == ':'):
+            # время уже в UTC и записано полностью: текст для базы
+            # собирается из исходной строки, как его собрал бы str()
+            text = f'{value[:10]} {value[11:19]}'
+            if parsed.microsecond:
+                return f'{text}.{parsed.microsecond:06d}'
+            return text
+        if self.to_utc:
+            parsed = parsed.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        return self.adapt(parsed)
+
+    def make_fast_clean(self):
+        """Проверка значения без сообщений об ошибках для строк без
+        ошибок: приведение типа и сравнение с границами валидаторов
+        MinValueValidator и MaxValueValidator. Любое исключение значит,
+        что значение нужно проверить через clean: там пустая строка
+        получает значение по умолчанию, а ошибка — сообщение."""
+        bounds = [validator for validator in self.validators
+                  if type(validator) in (MinValueValidator,
+                                         MaxValueValidator)]
+        if self.choices is not None or len(bounds) != len(self.validators):
+            return self.clean
+        if self.convert is not str and not bounds:
+            # int('') и разбор даты из пустой строки сами бросают ValueError
+            return self.convert
+        convert = self.convert
+        low = max((validator.limit_value for validator in bounds
+                   if type(validator) is MinValueValidator), default=None)
+        high = min((validator.limit_value for validator in bounds
+                    if type(validator) is MaxValueValidator), default=None)
+
+        def fast_clean(raw):
+            if raw == '':
+                raise ValueError(raw)
+            value = convert(raw)
+            if (low is not None and value < low
+                    or high is not None and value > high):
+                raise ValueError(raw)
+            return value
+
+        return fast_clean
+
+    def clean(self, raw):
+        if raw == '':
+            if self.field.blank and self.field.empty_strings_allowed:
+                return ''
+            if self.field.null:
+                return None
+            raise ValidationError('Обязательное поле.')
+        try:
+            value = self.convert(raw)
+        except (TypeError, ValueError):
+            raise ValidationError(f'Некорректное значение: {raw!r}.')
+        if self.choices is not None and value not in self.choices:
+            raise ValidationError(f'Недопустимое значение: {raw!r}.')
+        for validator in self.validators:
+            validator(value)
+        return value
+
+
+class CsvTable:
+    """Загрузка одного CSV-файла в таблицу модели.
+
+    Строки пишутся через executemany того же INSERT, который строит
+    bulk_create: компилятор ORM подготавливает каждое значение отдельно
+    и на SQLite ограничивает пакет 999 параметрами, что для больших
+    файлов в несколько раз медленнее. Колонки, которых нет в CSV,
+    получают значения по умолчанию полей модели.
+    """
+
+    def __init__(self, model, file_name, names):
+        self.model = model
+        self.file_name = file_name
+        self.columns = [CsvColumn(name, csv_field(model, name))
+                        for name in names]
+        self.fast_cleaners = [column.fast_clean for column in self.columns]
+        self.pk_position = next(
+            position for position, column in enumerate(self.columns)
+            if column.field.primary_key)
+        self.references = [
+            (position, column) for position, column in enumerate(self.columns)
+            if column.field.is_relation
+        ]
+        in_csv = {column.field for column in self.columns}
+        self.default_fields = [field
+                               for field in model._meta.concrete_fields
+                               if field not in in_csv]
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    def clean_row(self, row):
+        """Кортеж значений для базы из значений колонок в порядке names
+        или ValidationError со словарём ошибок по колонкам."""
+        try:
+            return tuple([clean(raw)
+                          for clean, raw in zip(self.fast_cleaners, row)])
+        except (TypeError, ValueError, ValidationError):
+            pass
+        values, errors = [], {}
+        for column, raw in zip(self.columns, row):
+            try:
+                values.append(column.clean(raw))
+            except ValidationError as error:
+                errors[column.name] = error.messages
+        if errors:
+            raise ValidationError(errors)
+        return tuple(values)
+
+    def __reduce__(self):
+        # для передачи в процессы пула: поля и колонки строятся заново
+        return self.__class__, (self.model, self.file_name, self.names)
+
+    def dependencies(self):
+        return {column.field.related_model for _, column in self.references
+                if column.field.related_model is not self.model}
+
+    def missing_references(self, rows, known_ids):
+        """Значения колонок-ссылок пакета на отсутствующие объекты:
+        {позиция колонки: множество значений}. Каждое значение
+        проверяется один раз на пакет, а не в каждой строке."""
+        missing = {}
+        for position, column in self.references:
+            ids = known_ids.get(column.field.related_model)
+            absent = {value for value in set(map(itemgetter(position), rows))
+                      if value is not None and value not in ids}
+            if absent:
+                missing[position] = absent
+        return missing
+
+    def pks(self, rows):
+        return (row[self.pk_position] for row in rows)
+
+    def insert_sql(self):
+        quote = connection.ops.quote_name
+        fields = [column.field for column in self.columns]
+        fields += self.default_fields
+        return 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(self.model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+
+    def defaults(self):
+        return tuple(field.get_db_prep_save(field.get_default(), connection)
+                     for field in self.default_fields)
+
+    def write(self, rows):
+        defaults = self.defaults()
+        with connection.cursor() as cursor:
+            cursor.executemany(self.insert_sql(),
+                               [row + defaults for row in rows])
+
+    def update_sql(self):
+        quote = connection.ops.quote_name
+        return 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(self.model._meta.db_table),
+            ', '.join(f'{quote(column.field.column)} = %s'
+                      for position, column in enumerate(self.columns)
+                      if position != self.pk_position),
+            quote(self.columns[self.pk_position].field.column),
+        )
+
+    def update(self, rows):
+        """Перезаписывает колонки CSV у существующих строк; колонки, которых
+        в CSV нет, не меняются."""
+        pk = self.pk_position
+        with connection.cursor() as cursor:
+            cursor.executemany(self.update_sql(), [
+                row[:pk] + row[pk + 1:] + (row[pk],) for row in rows])
+
+
+class ImportedRows:
+    """Контрольные суммы строк одного CSV-файла, записанных в базу.
+
+    Суммы читаются диапазоном id пакета: файлы выгрузок упорядочены по
+    id, и один запрос по индексу (source, row_id) заменяет запрос на
+    каждую строку.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.rows = ImportedRow.objects.filter(source=source)
+
+    def get(self, first, last):
+        return dict(self.rows.filter(row_id__range=(first, last)).values_list(
+            'row_id', 'checksum'))
+
+    def save(self, checksums, stored=()):
+        """Записывает суммы {id: сумма}; stored — уже сохранённые суммы
+        этих id, их строки обновляются."""
+        quote = connection.ops.quote_name
+        table = quote(ImportedRow._meta.db_table)
+        inserted = [(self.source, row_id, checksum)
+                    for row_id, checksum in checksums.items()
+                    if row_id not in stored]
+        updated = [(checksum, self.source, row_id)
+                   for row_id, checksum in checksums.items()
+                   if row_id in stored]
+        with connection.cursor() as cursor:
+            if inserted:
+                cursor.executemany(
+                    f'INSERT INTO {table} ({quote("source")}, '
+                    f'{quote("row_id")}, {quote("checksum")}) '
+                    f'VALUES (%s, %s, %s)', inserted)
+            if updated:
+                cursor.executemany(
+                    f'UPDATE {table} SET {quote("checksum")} = %s '
+                    f'WHERE {quote("source")} = %s AND {quote("row_id")} = %s',
+                    updated)
+
+    def missing(self, seen):
+        """id сохранённых строк, которых нет в seen."""
+        ids = self.rows.values_list('row_id', flat=True).order_by()
+        return [row_id for row_id in ids.iterator(chunk_size=10000)
+                if row_id not in seen]
+
+    def delete(self, ids):
+        self.rows.filter(row_id__in=ids).delete()
+
+    def clear(self):
+        self.rows.delete()
+
+
+class SecondaryIndexes:
+    """Неуникальные индексы таблицы модели: индексы Meta.indexes и
+    индексы полей с db_index.
+
+    При полной загрузке индексы дешевле построить один раз по записанной
+    таблице, чем обновлять на каждую строку, как и поисковый индекс.
+    Уникальные ограничения остаются: они проверяют данные при записи.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def statements(self, connection):
+        """{имя индекса: SQL создания} по метаданным модели."""
+        editor = connection.SchemaEditorClass(connection)
+        table = self.model._meta.db_table
+        statements = {
+            index.name: str(index.create_sql(self.model, editor))
+            for index in self.model._meta.indexes
+        }
+        for field in self.model._meta.local_fields:
+            if field.db_index and not field.unique:
+                name = editor._create_index_name(table, [field.column])
+                statements[name] = str(editor._create_index_sql(
+                    self.model, fields=[field]))
+        return statements
+
+    def existing(self, connection):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(
+                cursor, self.model._meta.db_table))
+
+    def suspend(self, connection):
+        editor = connection.SchemaEditorClass(connection)
+        existing = self.existing(connection)
+        with connection.cursor() as cursor:
+            for name in self.statements(connection):
+                if name in existing:
+                    cursor.execute(str(editor._delete_index_sql(
+                        self.model, name)))
+
+    def install(self, connection):
+        """Создаёт индексы, которых нет (в том числе после загрузки,
+        прерванной до install)."""
+        existing = self.existing(connection)
+        with connection.cursor() as cursor:
+            for name, sql in self.statements(connection).items():
+                if name not in existing:
+                    cursor.execute(sql)
+
+
+def dependency_levels(tables):
+    """Уровни графа зависимостей таблиц по внешним ключам: таблицы одного
+    уровня ссылаются только на таблицы предыдущих уровней (или на модели,
+    которых нет среди загружаемых) и не зависят друг от друга."""
+    loaded = {table.model for table in tables}
+    remaining = {table: table.dependencies() & loaded for table in tables}
+    levels = []
+    while remaining:
+        pending = {table.model for table in remaining}
+        level = [table for table, dependencies in remaining.items()
+                 if not dependencies & pending]
+        if not level:
+            raise ValueError('Циклические ссылки между таблицами: '
+                             + ', '.join(table.file_name
+                                         for table in remaining))
+        levels.append(level)
+        for table in level:
+            del remaining[table]
+    return levels
@@ -1,10 +1,44 @@
 import csv
+import os
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import groupby
+from operator import itemgetter
 
-from django.core.management.base import BaseCommand
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, transaction
+from django.db.models.deletion import Collector
 
-from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from api.cache import (USERS_NAMESPACE, bump_version, comments_namespace,
+                       reviews_namespace, title_list_cache)
+from reviews.denormalized import copied_columns
+from reviews.importer import (CsvTable, IdSet, ImportedRows, KnownIds,
+                              SecondaryIndexes, batched, dependency_levels,
+                              peak_memory, row_checksum)
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            ImportCheckpoint, Review, Title)
+from reviews.search import search_indexes
 from users.models import User
 
+BATCH_SIZE = 5000
+DANGLING_REPORT_LIMIT = 20
+# пакетов в работе на один процесс пула
+BATCHES_PER_WORKER = 2
+# id в одном запросе удаления и пересчёта рейтинга
+DELETE_CHUNK_SIZE = 500
+# кэш страниц SQLite на время загрузки, КБ
+SQLITE_CACHE_SIZE = 200000
+# колонки-родители, по которым загрузка изменений пересчитывает рейтинги
+# и сбрасывает кэши списков отзывов и комментариев
+PARENT_COLUMNS = {Review: 'title_id', Comment: 'review_id'}
+
 csv_files = ["category.csv", "genre.csv", "titles.csv", "genre_title.csv",
              "users.csv", "review.csv", "comments.csv"]
 
@@ -28,87 +62,527 @@ Models = {"category": Category,
           "comments": Comment}
 
 
-def csv_reader_file(csv_file_name):
-    csv_file_path = "static/data/" + csv_file_name
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        csvreader = csv.DictReader(csvfile)
-        return list(csvreader)
+class ByteLines:
+    """Строки файла, открытого в двоичном режиме, для csv.reader; position
+    — смещение в байтах за последней прочитанной строкой.
+
+    csv.reader читает строки только по мере надобности, поэтому после
+    каждой записи position указывает на начало следующей, и с этого
+    места чтение можно продолжить через seek.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.position = file.tell()
+
+    def __iter__(self):
+        for line in self.file:
+            self.position += len(line)
+            yield line.decode('utf-8')
+
+
+def csv_reader_file(csv_file_name, data_dir, names, batch_size, start=0,
+                    record=0):
+    """Отдаёт пакеты значений колонок names по batch_size записей и
+    смещение в байтах за пакетом, не читая файл целиком. start — смещение,
+    с которого продолжить чтение после заголовка, record — число уже
+    прочитанных записей.
+
+    Число колонок и выбор нужных проверяются для всего пакета сразу
+    (map и itemgetter), без цикла Python по записям.
+    """
+    csv_file_path = f"{data_dir}/{csv_file_name}"
+    with open(csv_file_path, 'rb') as csvfile:
+        lines = ByteLines(csvfile)
+        header = next(csv.reader(lines), [])
+        missing = [name for name in names if name not in header]
+        if missing:
+            raise CommandError(
+                f"{csv_file_name}: нет колонок {', '.join(missing)}")
+        positions = [header.index(name) for name in names]
+        if positions == list(range(len(header))):
+            select = None
+        elif len(positions) > 1:
+            select = itemgetter(*positions)
+        else:
+            def select(row):
+                return (row[positions[0]],)
+        if start > lines.position:
+            csvfile.seek(start)
+            lines = ByteLines(csvfile)
+        for batch in batched(csv.reader(lines), batch_size):
+            if set(map(len, batch)) != {len(header)}:
+                number, row = next(
+                    (number, row)
+                    for number, row in enumerate(batch, record + 1)
+                    if len(row) != len(header))
+                raise CommandError(
+                    f"{csv_file_name}, запись {number}: "
+                    f"ожидалось колонок {len(header)}, получено "
+                    f"{len(row)}")
+            record += len(batch)
+            if select is not None:
+                batch = list(map(select, batch))
+            yield batch, lines.position
+
+
+def raw_batches(tables, data_dir, batch_size, checkpoints):
+    """Непроверенные пакеты строк всех файлов по порядку: (table, offset,
+    position, rows), где position — смещение в байтах за пакетом. Файлы
+    с точкой продолжения в checkpoints читаются с неё. Для пустого
+    остатка файла отдаётся один пустой пакет."""
+    for table in tables:
+        checkpoint = checkpoints.get(table.file_name)
+        position, offset = ((checkpoint.position, checkpoint.records)
+                            if checkpoint else (0, 0))
+        empty = True
+        for batch, position in csv_reader_file(
+                table.file_name, data_dir, table.names, batch_size,
+                position, offset):
+            yield table, offset, position, batch
+            offset += len(batch)
+            empty = False
+        if empty:
+            yield table, offset, position, []
+
+
+def fingerprint(data_dir, file_name):
+    """Размер и время изменения файла: по ним --resume узнаёт, что файл
+    не менялся после прерванной загрузки."""
+    stat = os.stat(f"{data_dir}/{file_name}")
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def clean_batch(table, offset, rows, checksums=True):
+    """Проверяет пакет строк; выполняется в процессах пула. Возвращает
+    пары (значения, контрольная сумма исходной строки или None, если
+    checksums не нужны)."""
+    values = []
+    for number, row in enumerate(rows, offset + 1):
+        try:
+            values.append((table.clean_row(row),
+                           row_checksum(row) if checksums else None))
+        except ValidationError as error:
+            raise CommandError(
+                f"{table.file_name}, запись {number}: "
+                f"{error.message_dict}")
+    return values
+
+
+def drop_dangling(table, values, known_ids, dangling):
+    """Убирает строки со ссылками на отсутствующие объекты, подсчитывая
+    ссылки в dangling для общего отчёта по файлу."""
+    missing = table.missing_references(
+        list(map(itemgetter(0), values)), known_ids)
+    if not missing:
+        return values
+    kept = []
+    for row, checksum in values:
+        references = [(table.columns[position].name, row[position])
+                      for position, absent in missing.items()
+                      if row[position] in absent]
+        if references:
+            dangling.update(references)
+        else:
+            kept.append((row, checksum))
+    return kept
+
+
+def delete_rows(model, ids):
+    """Удаляет объекты с каскадом, как QuerySet.delete(); возвращает
+    число удалённых объектов модели и id произведений удалённых
+    отзывов, у которых нужно пересчитать рейтинг."""
+    collector = Collector(using=DEFAULT_DB_ALIAS)
+    collector.collect(model._default_manager.filter(pk__in=ids))
+    titles = {review.title_id for review in collector.data.get(Review, ())}
+    for queryset in collector.fast_deletes:
+        if queryset.model is Review:
+            titles.update(queryset.values_list('title_id', flat=True))
+    _, deleted = collector.delete()
+    return deleted.get(model._meta.label, 0), titles
+
+
+def dangling_report(file_name, dangling):
+    """Сводка по пропущенным ссылкам: самые частые значения и их число."""
+    shown = ', '.join(
+        f"{name}={value} ({count})"
+        for (name, value), count in dangling.most_common(
+            DANGLING_REPORT_LIMIT))
+    hidden = len(dangling) - DANGLING_REPORT_LIMIT
+    if hidden > 0:
+        shown += f" и ещё {hidden}"
+    return (f"{file_name}: пропущено {sum(dangling.values())} записей со "
+            f"ссылками на отсутствующие объекты: {shown}")
 
 
 class Command(BaseCommand):
+    help = 'Загружает данные из CSV-файлов в базу'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Число строк в одном INSERT и одной транзакции')
+        parser.add_argument(
+            '--data-dir', default=settings.BASE_DIR / 'static' / 'data',
+            help='Каталог с CSV-файлами')
+        parser.add_argument(
+            '--workers', type=int, default=(os.cpu_count() or 1) - 1,
+            help='Процессов для разбора и проверки CSV (по умолчанию на '
+                 'один меньше числа ядер: одно остаётся писателю); '
+                 '0 — без пула')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Загрузить только изменения: строки, контрольная сумма '
+                 'которых не изменилась с прошлой загрузки, пропускаются, '
+                 'изменённые обновляются')
+        parser.add_argument(
+            '--delete-missing', action='store_true',
+            help='Вместе с --incremental: удалить загруженные ранее строки, '
+                 'которых нет в файлах')
+        parser.add_argument(
+            '--checksums', action='store_true',
+            help='Сохранить при полной загрузке контрольные суммы строк для '
+                 'следующих загрузок с --incremental (без этого суммы '
+                 'сохраняет первая загрузка изменений)')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную загрузку с последнего записанного '
+                 'пакета')
 
     def handle(self, *args, **options):
-        for csv_file_name in csv_files:
-            for row in csv_reader_file(csv_file_name):
-                model = csv_file_name.split('.')[0]
-                model_class = Models.get(model)
-                item = None
-                if model_class == Category:
-                    item = Category(
-                        id=row["id"],
-                        name=row["name"],
-                        slug=row["slug"])
-                elif model_class == Genre:
-                    item = Genre(
-                        id=row["id"],
-                        name=row["name"],
-                        slug=row["slug"])
-                elif model_class == Title:
-                    category_id = int(row["category"])
-                    category_instance = Category.objects.get(pk=category_id)
-                    item = Title(
-                        name=row["name"],
-                        year=int(row["year"]),
-                        category=category_instance
-                    )
-                elif model_class == GenreTitle:
-                    genre_id = int(row["genre_id"])
-                    genre_instance = Genre.objects.get(pk=genre_id)
-                    title_id = int(row["title_id"])
-                    title_instance = Title.objects.get(pk=title_id)
-                    item = GenreTitle.objects.create(
-                        genre=genre_instance,
-                        title_id=title_instance.id)
-                elif model_class == User:
-                    item = User(
-                        id=int(row["id"]),
-                        username=row["username"],
-                        email=row["email"],
-                        role=row["role"],
-                        bio=row["bio"],
-                        first_name=row["first_name"],
-                        last_name=row["last_name"]
-                    )
-                elif model_class == Review:
-                    author_id = int(row["author"])
-                    author_instanse = User.objects.get(pk=author_id)
-                    title_id = int(row["title_id"])
-                    title_instance = Title.objects.get(pk=title_id)
-                    item = Review(
-                        id=int(row["id"]),
-                        title=title_instance,
-                        text=row["text"],
-                        author=author_instanse,
-                        score=int(row["score"]),
-                        pub_date=row["pub_date"]
-                    )
-                elif model_class == Comment:
-                    author_id = int(row["author"])
-                    author_instanse = User.objects.get(pk=author_id)
-                    review_id = int(row["review_id"])
-                    review_instance = Review.objects.get(pk=review_id)
-                    item = Comment(
-                        id=int(row["id"]),
-                        review=review_instance,
-                        text=row["text"],
-                        author=author_instanse,
-                        pub_date=row["pub_date"]
-                    )
-                else:
-                    self.stdout.write(self.style.ERROR(
-                        f"Не удалось создать объект для модели {model}"))
-                    continue
-                item.full_clean()
-                item.save()
-                self.stdout.write(self.style.SUCCESS(
-                    f"Запись для модели {model} успешно добавлена: {row}"))
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        incremental = options['incremental']
+        if options['delete_missing'] and not incremental:
+            raise CommandError('--delete-missing работает только вместе с '
+                               '--incremental')
+        if options['delete_missing'] and options['resume']:
+            # строки, записанные до остановки, не попадут в число
+            # встреченных и были бы удалены
+            raise CommandError('--delete-missing нельзя совмещать с --resume')
+        # загрузке изменений суммы нужны всегда
+        options['checksums'] = options['checksums'] or incremental
+        order = self.load_order()
+        checkpoints = self.checkpoints(order, options)
+        known_ids = KnownIds()
+        # модели, строки которых изменились, и id родителей изменённых
+        # отзывов и комментариев
+        self.changed = set()
+        self.parents = defaultdict(set)
+        seen = {}
+        # при полной загрузке индексы дешевле построить заново по
+        # записанным таблицам; при загрузке изменений — обновлять
+        indexes = [] if incremental else [
+            SecondaryIndexes(table.model) for table in order
+        ] + list(search_indexes) + list(copied_columns)
+        for index in indexes:
+            index.suspend(connection)
+        self.pragmas = {}
+        try:
+            with closing(self.cleaned(
+                    [table for table in order
+                     if not checkpoints[table.file_name].done],
+                    checkpoints, options)) as batches:
+                for table, group in groupby(batches, key=itemgetter(0)):
+                    seen[table] = self.load_table(
+                        table, group, known_ids, incremental,
+                        checkpoints[table.file_name])
+        finally:
+            self.restore_pragmas()
+            started = time.perf_counter()
+            for index in indexes:
+                index.install(connection)
+            if indexes:
+                self.stdout.write(f"Индексы построены за "
+                                  f"{time.perf_counter() - started:.2f} с")
+        if options['delete_missing']:
+            # дочерние таблицы раньше родительских
+            for table in reversed(order):
+                self.delete_missing(table, seen[table])
+        # изменения, записанные до остановки, не попали в self.parents
+        self.finish(incremental and not options['resume'])
+        self.report_memory(options['workers'])
+
+    def tune_connection(self):
+        """Настраивает SQLite для загрузки: большой кэш страниц, чтобы
+        уникальные индексы обновлялись в памяти, и без fsync на каждую
+        транзакцию. Прерывание процесса пакетам и точкам продолжения не
+        страшно, но при сбое питания или ОС запись последних пакетов
+        может не сохраниться — загрузку тогда нужно повторить."""
+        if connection.vendor != 'sqlite' or self.pragmas:
+            return
+        with connection.cursor() as cursor:
+            for name, value in (('synchronous', 'OFF'),
+                                ('cache_size', -SQLITE_CACHE_SIZE)):
+                cursor.execute(f'PRAGMA {name}')
+                self.pragmas[name] = cursor.fetchone()[0]
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+    def restore_pragmas(self):
+        with connection.cursor() as cursor:
+            for name, value in self.pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+    def report_memory(self, workers):
+        memory = peak_memory()
+        if memory is not None:
+            message = f"Пиковое потребление памяти: {memory:.1f} МБ"
+            if workers > 0:
+                message += (f", процессов пула: "
+                            f"{peak_memory(children=True):.1f} МБ")
+            self.stdout.write(message)
+
+    def load_order(self):
+        """Таблицы CSV-файлов в порядке загрузки по внешним ключам."""
+        tables = [CsvTable(Models[csv_file_name.split('.')[0]],
+                           csv_file_name, csv_fields[csv_file_name])
+                  for csv_file_name in csv_files]
+        try:
+            levels = dependency_levels(tables)
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write('Порядок загрузки: ' + ' -> '.join(
+            ', '.join(table.file_name for table in level)
+            for level in levels))
+        return [table for level in levels for table in level]
+
+    def checkpoints(self, tables, options):
+        """Точки продолжения загрузки по файлам.
+
+        Без --resume прежние точки удаляются и загрузка всех файлов
+        начинается сначала; с --resume файлы, загруженные до конца,
+        пропускаются, а остальные читаются с сохранённого смещения, если
+        файл с тех пор не менялся.
+        """
+        data_dir = options['data_dir']
+        checkpoints = {}
+        if options['resume']:
+            checkpoints = ImportCheckpoint.objects.in_bulk(
+                field_name='source')
+        else:
+            ImportCheckpoint.objects.all().delete()
+        for table in tables:
+            checkpoint = checkpoints.get(table.file_name)
+            if checkpoint is None:
+                continue
+            if checkpoint.fingerprint != fingerprint(data_dir,
+                                                     table.file_name):
+                raise CommandError(
+                    f"{table.file_name}: файл изменился после прерванной "
+                    f"загрузки, запустите её без --resume")
+            if checkpoint.done:
+                self.stdout.write(
+                    f"{table.file_name}: загружен ранее, пропущен")
+            else:
+                self.stdout.write(
+                    f"{table.file_name}: продолжение с записи "
+                    f"{checkpoint.records + 1} (id {checkpoint.last_id})")
+        new = [ImportCheckpoint(source=table.file_name,
+                                fingerprint=fingerprint(data_dir,
+                                                        table.file_name))
+               for table in tables if table.file_name not in checkpoints]
+        ImportCheckpoint.objects.bulk_create(new)
+        checkpoints.update((checkpoint.source, checkpoint)
+                           for checkpoint in new)
+        return checkpoints
+
+    def finish(self, incremental):
+        """Сдвигает счётчики первичных ключей и пересчитывает рейтинги:
+        после загрузки изменений — только затронутых произведений."""
+        # CSV задаёт первичные ключи явно, счётчики СУБД нужно подвинуть
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), list(Models.values())):
+                cursor.execute(sql)
+        if incremental:
+            for ids in batched(sorted(self.parents[Review]),
+                               DELETE_CHUNK_SIZE):
+                Title.objects.filter(pk__in=ids).recalculate_rating()
+            self.invalidate_caches()
+        else:
+            Title.objects.recalculate_rating()
+            # после полной загрузки устарел весь кэш API
+            cache.clear()
+
+    def invalidate_caches(self):
+        """Сбрасывает кэши API, которые затронули изменения: записи
+        executemany не вызывают сигналов моделей."""
+        if not self.changed:
+            return
+        title_list_cache.invalidate()
+        if User in self.changed:
+            bump_version(USERS_NAMESPACE)
+        reviews = self.parents[Comment]
+        titles = set(self.parents[Review])
+        for ids in batched(sorted(reviews), DELETE_CHUNK_SIZE):
+            titles.update(Review.objects.filter(pk__in=ids).values_list(
+                'title_id', flat=True))
+        for review_id in reviews:
+            bump_version(comments_namespace(review_id))
+        for title_id in titles:
+            bump_version(reviews_namespace(title_id))
+
+    def cleaned(self, tables, checkpoints, options):
+        """Проверенные пакеты (table, offset, position, values) в порядке
+        записи.
+
+        Пакеты всех файлов проверяются в пуле процессов с опережением на
+        BATCHES_PER_WORKER пакетов на процесс, так что проверка следующих
+        файлов идёт, пока пишутся предыдущие. Запись остаётся в этом
+        процессе и идёт по одной таблице, как того требует SQLite.
+        """
+        batches = raw_batches(tables, options['data_dir'],
+                              options['batch_size'], checkpoints)
+        workers, checksums = options['workers'], options['checksums']
+        if workers < 1:
+            for table, offset, position, rows in batches:
+                yield (table, offset, position,
+                       clean_batch(table, offset, rows, checksums))
+            return
+        # процессы пула не должны наследовать открытое соединение
+        if not connection.in_atomic_block:
+            connection.close()
+        executor = ProcessPoolExecutor(workers, initializer=django.setup)
+        try:
+            pending = deque()
+            for table, offset, position, rows in batches:
+                pending.append((table, offset, position, executor.submit(
+                    clean_batch, table, offset, rows, checksums)))
+                if len(pending) >= workers * BATCHES_PER_WORKER:
+                    table, offset, position, future = pending.popleft()
+                    yield table, offset, position, future.result()
+            while pending:
+                table, offset, position, future = pending.popleft()
+                yield table, offset, position, future.result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def load_table(self, table, batches, known_ids, incremental,
+                   checkpoint):
+        """Записывает пакеты одного файла; возвращает id записанных
+        строк.
+
+        Каждый пакет записывается в своей транзакции вместе с точкой
+        продолжения: смещением в байтах за пакетом, числом прочитанных
+        записей и id последней из них.
+        """
+        self.tune_connection()
+        started = time.perf_counter()
+        stats, dangling = Counter(), Counter()
+        imported = ImportedRows(table.file_name)
+        checkpoints = ImportCheckpoint.objects.filter(source=table.file_name)
+        seen = IdSet()
+        if not incremental and not checkpoint.records:
+            imported.clear()
+        for _, offset, position, values in batches:
+            progress = {'position': position,
+                        'records': offset + len(values)}
+            if values:
+                progress['last_id'] = values[-1][0][table.pk_position]
+            values = drop_dangling(table, values, known_ids, dangling)
+            try:
+                with transaction.atomic():
+                    if incremental:
+                        self.apply_delta(table, imported, values, stats)
+                    else:
+                        self.write_batch(table, imported, values)
+                        stats['added'] += len(values)
+                    checkpoints.update(**progress)
+            except IntegrityError as error:
+                raise CommandError(
+                    f"{table.file_name}, пакет с записи {offset + 1}: "
+                    f"{error}" + ('' if incremental else (
+                        ". Прерванную загрузку продолжает --resume, "
+                        "в непустую базу загружает --incremental")))
+            pks = list(table.pks(row for row, _ in values))
+            known_ids.add(table.model, pks)
+            seen.update(pks)
+        checkpoints.update(done=True)
+        elapsed = time.perf_counter() - started
+        count = sum(stats.values())
+        if incremental:
+            loaded = (f"добавлено {stats['added']}, изменено "
+                      f"{stats['changed']}, без изменений "
+                      f"{stats['unchanged']} записей")
+        else:
+            loaded = f"загружено {count} записей"
+        self.stdout.write(self.style.SUCCESS(
+            f"{table.file_name}: {loaded} модели "
+            f"{table.model.__name__} за {elapsed:.2f} с "
+            f"({count / max(elapsed, 1e-9):.0f} строк/с)"))
+        if dangling:
+            self.stdout.write(self.style.WARNING(
+                dangling_report(table.file_name, dangling)))
+        return seen
+
+    def write_batch(self, table, imported, values):
+        table.write([row for row, _ in values])
+        if values and values[0][1] is not None:
+            imported.save(dict(zip(table.pks(row for row, _ in values),
+                                   (checksum for _, checksum in values))))
+
+    def apply_delta(self, table, imported, values, stats):
+        """Записывает изменения пакета: новые строки вставляются,
+        строки с другой контрольной суммой обновляются, остальные
+        пропускаются.
+
+        Существующие строки и их суммы читаются двумя запросами по
+        диапазону id пакета. Строка без изменений должна и совпадать по
+        сумме, и быть в таблице: удалённые вне импорта строки
+        вставляются снова, а строки полной загрузки без --checksums один
+        раз перезаписываются вместе с суммами.
+        """
+        if not values:
+            return
+        pks = list(table.pks(row for row, _ in values))
+        first, last = min(pks), max(pks)
+        existing = table.model._default_manager.filter(
+            pk__range=(first, last)).order_by()
+        parent = PARENT_COLUMNS.get(table.model)
+        if parent:
+            existing = dict(existing.values_list('pk', parent))
+        else:
+            existing = dict.fromkeys(existing.values_list('pk', flat=True))
+        stored = imported.get(first, last)
+        added, changed, checksums = [], [], {}
+        for pk, (row, checksum) in zip(pks, values):
+            if pk not in existing:
+                added.append(row)
+            elif stored.get(pk) != checksum:
+                changed.append(row)
+            else:
+                continue
+            checksums[pk] = checksum
+        stats['added'] += len(added)
+        stats['changed'] += len(changed)
+        stats['unchanged'] += len(values) - len(added) - len(changed)
+        if not checksums:
+            return
+        self.changed.add(table.model)
+        if parent:
+            parents = self.parents[table.model]
+            position = table.names.index(parent)
+            parents.update(row[position] for row in added + changed)
+            parents.update(existing[row[table.pk_position]]
+                           for row in changed)
+        table.write(added)
+        table.update(changed)
+        imported.save(checksums, stored)
+
+    def delete_missing(self, table, seen):
+        """Удаляет загруженные ранее строки, которых нет в файле. Строки,
+        созданные не импортом, не трогаются: у них нет контрольных сумм."""
+        imported = ImportedRows(table.file_name)
+        deleted = 0
+        for ids in batched(imported.missing(seen), DELETE_CHUNK_SIZE):
+            with transaction.atomic():
+                count, titles = delete_rows(table.model, ids)
+                imported.delete(ids)
+            deleted += count
+            self.parents[Review].update(titles)
+        if deleted:
+            self.changed.add(table.model)
+            self.stdout.write(self.style.WARNING(
+                f"{table.file_name}: удалено {deleted} записей модели "
+                f"{table.model.__name__}, которых нет в файле"))
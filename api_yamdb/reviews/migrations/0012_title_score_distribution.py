@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, Coalesce
+
+SCORES = range(1, 11)
+
+
+def fill_distribution(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')).order_by().values('title')
+    Title.objects.update(**{
+        f'score_{score}_count': Coalesce(Subquery(reviews.annotate(
+            value=Count('pk', Q(score=score))).values('value')), 0)
+        for score in SCORES
+    })
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    Title.objects.update(weighted_rating=(
+        (Cast(F('score_sum'), FloatField())
+         + prior_weight * settings.RATING_PRIOR_MEAN)
+        / (F('reviews_count') + prior_weight)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_title_filter_indexes'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name='title',
+                name=f'score_{score}_count',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name=f'количество оценок {score}'),
+            )
+            for score in SCORES
+        ],
+        migrations.AddField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(editable=False, null=True, verbose_name='взвешенный рейтинг'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['weighted_rating', 'id'], name='title_weighted_rating_idx'),
+        ),
+        migrations.RunPython(fill_distribution, migrations.RunPython.noop),
+    ]
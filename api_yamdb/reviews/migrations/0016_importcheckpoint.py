@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_importedrow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, unique=True, verbose_name='файл')),
+                ('fingerprint', models.CharField(max_length=50, verbose_name='размер и время изменения файла')),
+                ('position', models.BigIntegerField(default=0, verbose_name='смещение в байтах')),
+                ('records', models.BigIntegerField(default=0, verbose_name='записей обработано')),
+                ('last_id', models.BigIntegerField(null=True, verbose_name='id последней записи')),
+                ('done', models.BooleanField(default=False, verbose_name='файл загружен')),
+            ],
+            options={
+                'verbose_name': 'Точка продолжения загрузки',
+                'verbose_name_plural': 'Точки продолжения загрузки',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+import reviews.models
+
+
+def fill_weighted_rating(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    Title.objects.update(weighted_rating=(
+        (Cast(F('score_sum'), FloatField())
+         + prior_weight * settings.RATING_PRIOR_MEAN)
+        / (F('reviews_count') + prior_weight)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(default=reviews.models.prior_mean, editable=False, null=True, verbose_name='взвешенный рейтинг'),
+        ),
+        migrations.RunPython(fill_weighted_rating, migrations.RunPython.noop),
+    ]
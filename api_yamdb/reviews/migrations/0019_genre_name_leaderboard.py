@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_genre_rating_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genretitle',
+            name='title_name',
+            field=models.CharField(default='', editable=False, max_length=256, verbose_name='название произведения'),
+        ),
+        migrations.AddIndex(
+            model_name='genretitle',
+            index=models.Index(fields=['genre', 'title_name', 'title'], name='genretitle_genre_name_idx'),
+        ),
+    ]
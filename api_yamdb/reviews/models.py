@@ -1,11 +1,27 @@
+from collections import Counter
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import (Count, F, FloatField, OuterRef, Q, Subquery,
+                              Sum)
+from django.db.models.functions import Cast, Coalesce, NullIf
 
 User = get_user_model()
 
+SCORES = range(1, 11)
+
+
+def score_field(score):
+    return f'score_{score}_count'
+
+
+def prior_mean():
+    """Взвешенный рейтинг произведения без отзывов."""
+    return settings.RATING_PRIOR_MEAN
+
 
 class Genre(models.Model):
     name = models.CharField(max_length=256,
@@ -41,6 +57,57 @@ class Category(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    def update_rating(self, added=(), removed=()):
+        """Сдвигает сохранённые рейтинги и гистограмму оценок
+        на добавленные/удалённые оценки."""
+        histogram = Counter(added)
+        histogram.subtract(removed)
+        score_sum = F('score_sum') + (sum(added) - sum(removed))
+        reviews_count = F('reviews_count') + (len(added) - len(removed))
+        return self.update(
+            score_sum=score_sum,
+            reviews_count=reviews_count,
+            **self.rating_expressions(score_sum, reviews_count),
+            **{score_field(score): F(score_field(score)) + delta
+               for score, delta in histogram.items() if delta},
+        )
+
+    def recalculate_rating(self):
+        """Пересчитывает сохранённый рейтинг по таблице отзывов."""
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')).order_by().values('title')
+
+        def aggregate(expression):
+            return Coalesce(Subquery(
+                reviews.annotate(value=expression).values('value')), 0)
+
+        self.update(
+            score_sum=aggregate(Sum('score')),
+            reviews_count=aggregate(Count('pk')),
+            **{score_field(score): aggregate(Count('pk', Q(score=score)))
+               for score in SCORES},
+        )
+        return self.update(**self.rating_expressions(
+            F('score_sum'), F('reviews_count')))
+
+    @staticmethod
+    def rating_expressions(score_sum, reviews_count):
+        """Средняя оценка и байесовская оценка, сглаженная к
+        RATING_PRIOR_MEAN с весом RATING_PRIOR_WEIGHT отзывов."""
+        score_sum = Cast(score_sum, FloatField())
+        prior_weight = settings.RATING_PRIOR_WEIGHT
+        return {
+            'rating': score_sum / NullIf(reviews_count, 0),
+            # сумма оценок, а не average * reviews_count: без отзывов
+            # рейтинг равен RATING_PRIOR_MEAN, а не NULL
+            'weighted_rating': (
+                (score_sum + prior_weight * settings.RATING_PRIOR_MEAN)
+                / (reviews_count + prior_weight)
+            ),
+        }
+
+
 class Title(models.Model):
     name = models.CharField(max_length=256, verbose_name='Название')
     year = models.PositiveIntegerField(
@@ -54,8 +121,7 @@ class Title(models.Model):
                 int(datetime.now().year),
                 message='Значение года не может быть больше текущего'
             )
-        ],
-        db_index=True
+        ]
     )
     description = models.TextField(blank=True, verbose_name='описание',)
     genre = models.ManyToManyField(Genre,
@@ -68,16 +134,58 @@ class Title(models.Model):
                                  related_name='category',
                                  verbose_name='категория',
                                  null=True,
-                                 blank=True)
+                                 blank=True,
+                                 db_index=False)
+    score_sum = models.PositiveIntegerField(default=0,
+                                            editable=False,
+                                            verbose_name='сумма оценок')
+    reviews_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='количество отзывов'
+    )
+    rating = models.FloatField(null=True,
+                               editable=False,
+                               verbose_name='рейтинг')
+    weighted_rating = models.FloatField(null=True,
+                                        default=prior_mean,
+                                        editable=False,
+                                        verbose_name='взвешенный рейтинг')
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
         ordering = ('name',)
+        indexes = (
+            models.Index(fields=('name', 'id'), name='title_name_id_idx'),
+            models.Index(fields=('year', 'name', 'id'),
+                         name='title_year_name_idx'),
+            models.Index(fields=('category', 'name', 'id'),
+                         name='title_category_name_idx'),
+            models.Index(fields=('-rating', 'id'), name='title_rating_idx'),
+            models.Index(fields=('category', '-rating', 'id'),
+                         name='title_category_rating_idx'),
+            models.Index(fields=('weighted_rating', 'id'),
+                         name='title_weighted_rating_idx'),
+        )
 
     def __str__(self):
         return self.name
 
+    @property
+    def score_distribution(self):
+        return {score: getattr(self, score_field(score)) for score in SCORES}
+
+
+for score in SCORES:
+    Title.add_to_class(score_field(score), models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=f'количество оценок {score}'
+    ))
+
 
 class Review(models.Model):
     text = models.TextField(verbose_name='текст')
@@ -109,13 +217,18 @@ class Review(models.Model):
         on_delete=models.CASCADE,
         related_name='reviews',
         verbose_name='произведение',
-        null=True
+        null=True,
+        db_index=False
     )
 
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('title', 'pub_date', 'id'),
+                         name='review_title_pub_date_idx'),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=['author', 'title'],
@@ -126,25 +239,56 @@ class Review(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # оценка при загрузке: по ней сигналы сдвигают агрегаты рейтинга
+        title_id = instance.__dict__.get('title_id')
+        score = instance.__dict__.get('score')
+        if score is not None:
+            instance.loaded_rating = (title_id, score)
+        return instance
+
 
 class GenreTitle(models.Model):
     genre = models.ForeignKey(
         Genre,
         on_delete=models.CASCADE,
         related_name='genre_through',
-        verbose_name='Жанр'
+        verbose_name='Жанр',
+        db_index=False
     )
     title = models.ForeignKey(
         Title,
         on_delete=models.CASCADE,
         related_name='title_through',
-        verbose_name='произведение'
+        verbose_name='произведение',
+        db_index=False
     )
+    # копии полей произведения для выборок по жанру в порядке индекса;
+    # их поддерживают триггеры из reviews.denormalized
+    title_name = models.CharField(max_length=256,
+                                  default='',
+                                  editable=False,
+                                  verbose_name='название произведения')
+    rating = models.FloatField(null=True,
+                               editable=False,
+                               verbose_name='рейтинг произведения')
 
     class Meta:
         verbose_name = 'Соответствие жанра и произведения'
         verbose_name_plural = 'Таблица соответствия жанров и произведений'
         ordering = ('id',)
+        indexes = (
+            models.Index(fields=('genre', 'title'),
+                         name='genretitle_genre_title_idx'),
+            models.Index(fields=('title', 'genre'),
+                         name='genretitle_title_genre_idx'),
+            models.Index(fields=('genre', 'title_name', 'title'),
+                         name='genretitle_genre_name_idx'),
+            models.Index(fields=('genre', '-rating', 'title'),
+                         name='genretitle_genre_rating_idx'),
+        )
 
     def __str__(self):
         return f'{self.title} принадлежит жанру/ам {self.genre}'
@@ -169,12 +313,88 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='oтзыв',
+        db_index=False
     )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('review', 'pub_date', 'id'),
+                         name='comment_review_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
+
+
+class ImportedRow(models.Model):
+    """Контрольная сумма строки CSV, загруженной import_csv_to_db.
+
+    По ней повторная загрузка в режиме --incremental пропускает
+    неизменившиеся строки.
+    """
+    source = models.CharField(
+        max_length=100,
+        verbose_name='файл'
+    )
+    row_id = models.BigIntegerField(
+        verbose_name='id строки'
+    )
+    checksum = models.BigIntegerField(
+        verbose_name='контрольная сумма'
+    )
+
+    class Meta:
+        verbose_name = 'Загруженная строка'
+        verbose_name_plural = 'Загруженные строки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('source', 'row_id'),
+                name='importedrow_source_row_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.source}:{self.row_id}'
+
+
+class ImportCheckpoint(models.Model):
+    """Место, до которого import_csv_to_db записал CSV-файл.
+
+    Сохраняется в транзакции каждого записанного пакета, поэтому
+    прерванная загрузка продолжается с --resume без повторной записи.
+    """
+    source = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='файл'
+    )
+    fingerprint = models.CharField(
+        max_length=50,
+        verbose_name='размер и время изменения файла'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='смещение в байтах'
+    )
+    records = models.BigIntegerField(
+        default=0,
+        verbose_name='записей обработано'
+    )
+    last_id = models.BigIntegerField(
+        null=True,
+        verbose_name='id последней записи'
+    )
+    done = models.BooleanField(
+        default=False,
+        verbose_name='файл загружен'
+    )
+
+    class Meta:
+        verbose_name = 'Точка продолжения загрузки'
+        verbose_name_plural = 'Точки продолжения загрузки'
+
+    def __str__(self):
+        return f'{self.source}:{self.position}'
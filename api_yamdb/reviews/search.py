@@ -0,0 +1,124 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Review, Title
+
+
+class FullTextIndex:
+    """Внешний FTS5-индекс по текстовым полям модели.
+
+    Таблица `<db_table>_fts` хранит только индекс, строки берутся из
+    таблицы модели. Синхронизацию выполняют триггеры SQLite, поэтому
+    индекс обновляется и при bulk_create, и при загрузке из CSV.
+    На других СУБД поиск сводится к icontains по тем же полям.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+    def columns(self, prefix=''):
+        names = [self.model._meta.get_field(name).column
+                 for name in self.fields]
+        return ', '.join(f'{prefix}{name}' for name in names)
+
+    def statements(self):
+        fts, table = self.fts_table, self.table
+        pk = self.model._meta.pk.column
+        columns = self.columns()
+        insert = (f"INSERT INTO {fts}(rowid, {columns}) "
+                  f"VALUES (new.{pk}, {self.columns('new.')});")
+        delete = (f"INSERT INTO {fts}({fts}, rowid, {columns}) "
+                  f"VALUES ('delete', old.{pk}, {self.columns('old.')});")
+        return (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{columns}, content='{table}', content_rowid='{pk}', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+            f"BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF "
+            f"{columns} ON {table} BEGIN {delete} {insert} END",
+        )
+
+    def triggers(self):
+        return [f'{self.fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+
+    def suspend(self, connection):
+        """Удаляет триггеры перед массовой загрузкой: построчное
+        обновление индекса медленнее, чем перестроение в install()."""
+        with connection.cursor() as cursor:
+            for trigger in self.triggers():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+    def install(self, connection):
+        """Создаёт индекс и триггеры, если их нет (например, после того
+        как миграция SQLite пересоздала таблицу модели)."""
+        triggers = self.triggers()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                triggers,
+            )
+            if cursor.fetchone()[0] == len(triggers):
+                return
+            for statement in self.statements():
+                cursor.execute(statement)
+            cursor.execute(
+                f"INSERT INTO {self.fts_table}({self.fts_table}) "
+                f"VALUES ('rebuild')"
+            )
+
+    @staticmethod
+    def match_expression(query):
+        """Слова запроса как префиксные фразы FTS5, объединённые по И."""
+        terms = query.replace('"', ' ').split()
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        """Отбирает и ранжирует строки queryset по запросу."""
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        connection = connections[queryset.db]
+        if connection.vendor != 'sqlite':
+            condition = Q()
+            for name in self.fields:
+                condition |= Q(**{f'{name}__icontains': query})
+            return queryset.filter(condition)
+        fts = self.fts_table
+        pk = f'"{self.table}"."{self.model._meta.pk.column}"'
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s',
+                          (match,)),
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT bm25({fts}) FROM {fts} '
+                f'WHERE {fts} MATCH %s AND rowid = {pk}',
+                (match,)),
+        ).order_by('search_rank', 'pk')
+
+
+title_index = FullTextIndex(Title, ('name', 'description'))
+review_index = FullTextIndex(Review, ('text',))
+
+
+search_indexes = (title_index, review_index)
+
+
+def install_search_indexes(sender, using, **kwargs):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        for index in search_indexes:
+            index.install(connection)
@@ -35,6 +35,13 @@ class User(AbstractUser):
         blank=True
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # имя при загрузке: по нему сигналы узнают о переименовании
+        instance.loaded_username = instance.__dict__.get('username')
+        return instance
+
     @property
     def is_user(self):
         return self.role == self.USER
@@ -0,0 +1,205 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title
+from tests.utils import (create_catalogue, create_discussion,
+                         create_single_review, create_titles)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    def test_01_rating_follows_review_changes(self, admin_client, user_client,
+                                              moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        reviews_url = f'{title_url}reviews/'
+
+        response = admin_client.get(title_url)
+        assert response.json().get('rating') is None, (
+            'Проверьте, что у произведения без отзывов поле `rating` '
+            'равно `None`.'
+        )
+
+        create_single_review(user_client, titles[0]['id'], 'Плохо', 2)
+        review = create_single_review(
+            moderator_client, titles[0]['id'], 'Хорошо', 9).json()
+        assert admin_client.get(title_url).json().get('rating') == 5.5, (
+            'Проверьте, что после создания отзывов сохранённый рейтинг '
+            'произведения равен средней оценке.'
+        )
+
+        response = moderator_client.patch(
+            f'{reviews_url}{review["id"]}/', data={'score': 4}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert admin_client.get(title_url).json().get('rating') == 3, (
+            'Проверьте, что после изменения оценки в отзыве рейтинг '
+            'произведения пересчитывается.'
+        )
+
+        response = moderator_client.delete(f'{reviews_url}{review["id"]}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert admin_client.get(title_url).json().get('rating') == 2, (
+            'Проверьте, что после удаления отзыва рейтинг произведения '
+            'пересчитывается.'
+        )
+        assert admin_client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/'
+        ).json().get('rating') is None, (
+            'Проверьте, что отзывы влияют только на рейтинг своего '
+            'произведения.'
+        )
+
+    def test_02_top_titles(self, settings, client, admin_client,
+                           user_client, moderator_client):
+        settings.TOP_TITLES_MIN_REVIEWS = 2
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/top/'
+        for title, scores in ((titles[0], (6, 8)), (titles[1], (10,))):
+            for author_client, score in zip((user_client, moderator_client),
+                                            scores):
+                create_single_review(author_client, title['id'], 'Ок', score)
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` возвращает ответ со '
+            'статусом 200.'
+        )
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id']
+        ], (
+            f'Проверьте, что `{url}` не выводит произведения с числом '
+            'отзывов меньше TOP_TITLES_MIN_REVIEWS.'
+        )
+
+        create_single_review(admin_client, titles[1]['id'], 'Ок', 9)
+        response = client.get(url)
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id'], titles[0]['id']
+        ], (
+            f'Проверьте, что `{url}` сортирует произведения по убыванию '
+            'рейтинга.'
+        )
+        response = client.get(f'{url}?genre={genres[0]["slug"]}')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id']
+        ], f'Проверьте, что `{url}` поддерживает фильтр по жанру.'
+        response = client.get(f'{url}?category={categories[1]["slug"]}')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id']
+        ], f'Проверьте, что `{url}` поддерживает фильтр по категории.'
+
+    def test_03_scores_and_weighted_rating(self, settings, client,
+                                           admin_client, user_client,
+                                           moderator_client):
+        settings.RATING_PRIOR_MEAN = 5
+        settings.RATING_PRIOR_WEIGHT = 2
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Ок', 10)
+        review = create_single_review(
+            moderator_client, titles[0]['id'], 'Ок', 10).json()
+        other = create_single_review(
+            user_client, titles[1]['id'], 'Ок', 10).json()
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+
+        data = client.get(url).json()
+        scores = {str(score): 0 for score in range(1, 11)}
+        assert data.get('scores') == dict(scores, **{'10': 2}), (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'распределение оценок в поле `scores`.'
+        )
+        assert data.get('weighted_rating') == 7.5, (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'байесовский рейтинг в поле `weighted_rating`.'
+        )
+        response = client.get('/api/v1/titles/?ordering=-weighted_rating')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id'], titles[1]['id']
+        ], (
+            'Проверьте, что `/api/v1/titles/` сортируется по '
+            '`weighted_rating`.'
+        )
+
+        moderator_client.patch(f'{url}reviews/{review["id"]}/',
+                               data={'score': 4})
+        data = client.get(url).json()
+        assert data['scores'] == dict(scores, **{'10': 1, '4': 1})
+        assert data['weighted_rating'] == 6
+
+        other_url = f'/api/v1/titles/{titles[1]["id"]}/'
+        user_client.delete(f'{other_url}reviews/{other["id"]}/')
+        assert client.get(other_url).json()['weighted_rating'] == 5, (
+            'Проверьте, что взвешенный рейтинг произведения без отзывов '
+            'равен RATING_PRIOR_MEAN.'
+        )
+        Title.objects.recalculate_rating()
+        ratings = Title.objects.values_list('weighted_rating', flat=True)
+        assert sorted(ratings) == [5, 6]
+
+    def test_04_rating_after_author_deleted(self, admin_client, user_client,
+                                            moderator_client, moderator):
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        create_single_review(user_client, titles[0]['id'], 'Плохо', 1)
+        create_single_review(moderator_client, titles[0]['id'], 'Отлично', 9)
+
+        response = admin_client.delete(
+            f'/api/v1/users/{moderator.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert admin_client.get(title_url).json().get('rating') == 1, (
+            'Проверьте, что рейтинг произведения пересчитывается, когда '
+            'отзыв удаляется вместе с автором.'
+        )
+
+    def test_05_scores_after_cascade_delete(self, settings, admin_client,
+                                            user_client, moderator_client,
+                                            moderator):
+        settings.RATING_PRIOR_MEAN = 5
+        settings.RATING_PRIOR_WEIGHT = 2
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        create_single_review(user_client, titles[0]['id'], 'Плохо', 1)
+        create_single_review(moderator_client, titles[0]['id'], 'Отлично', 9)
+        create_single_review(moderator_client, titles[1]['id'], 'Ок', 7)
+
+        admin_client.delete(f'/api/v1/users/{moderator.username}/')
+        data = admin_client.get(title_url).json()
+        scores = {str(score): 0 for score in range(1, 11)}
+        assert data['scores'] == dict(scores, **{'1': 1}), (
+            'Проверьте, что распределение оценок не учитывает отзывы, '
+            'удалённые вместе с автором.'
+        )
+        assert data['weighted_rating'] == (1 + 2 * 5) / 3
+        other = admin_client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/').json()
+        assert (other['rating'], other['weighted_rating']) == (None, 5), (
+            'Проверьте, что у произведения, потерявшего все отзывы вместе '
+            'с автором, рейтинг сбрасывается.'
+        )
+
+        Title.objects.get(pk=titles[0]['id']).reviews.all().delete()
+        data = admin_client.get(title_url).json()
+        assert data['scores'] == scores
+        assert data['weighted_rating'] == 5
+
+    def test_06_top_titles_without_rating(self, settings, client):
+        settings.TOP_TITLES_MIN_REVIEWS = 0
+        titles = create_catalogue(8)
+        create_discussion(titles[0], 1)
+        url = '/api/v1/titles/top/?cursor='
+
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{url}` возвращает ответ со '
+                'статусом 200.'
+            )
+            ids += [title['id'] for title in response.json()['results']]
+            url = response.json()['next']
+        assert ids == [titles[0].id], (
+            'Проверьте, что `/api/v1/titles/top/` не выводит произведения '
+            'без рейтинга.'
+        )
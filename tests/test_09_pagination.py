@@ -0,0 +1,88 @@
+from http import HTTPStatus
+
+import pytest
+from django.utils import timezone
+
+from reviews.models import Comment, Review
+from tests.utils import (create_catalogue, create_categories,
+                         create_discussion)
+
+
+def collect_pages(client, url, link_key='next'):
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` с параметром `cursor` '
+            'возвращает ответ со статусом 200.'
+        )
+        data = response.json()
+        assert 'count' not in data, (
+            'Проверьте, что в режиме курсора ответ не содержит ключ `count`.'
+        )
+        pages.append(data['results'])
+        url = data[link_key]
+    return pages
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09CursorPagination:
+
+    def test_01_titles_cursor_walk(self, admin_client, client):
+        category = create_categories(admin_client)[0]['slug']
+        names = ['Б', 'А', 'В', 'А', 'Г', 'Д', 'Е', 'А', 'Ж', 'З', 'И', 'К']
+        for name in names:
+            response = admin_client.post('/api/v1/titles/', data={
+                'name': name, 'year': 2000, 'genre': [], 'category': category
+            })
+            assert response.status_code == HTTPStatus.CREATED
+
+        pages = collect_pages(client, '/api/v1/titles/?cursor=')
+        titles = [title for page in pages for title in page]
+        expected = sorted(titles, key=lambda title: (title['name'],
+                                                     title['id']))
+        assert len(titles) == len(names) and titles == expected, (
+            'Проверьте, что обход `/api/v1/titles/?cursor=` по ссылкам '
+            '`next` возвращает все произведения ровно один раз в порядке '
+            '(name, id).'
+        )
+        assert [len(page) for page in pages] == [5, 5, 2]
+
+        last_page = client.get('/api/v1/titles/?cursor=').json()
+        while last_page['next']:
+            last_page = client.get(last_page['next']).json()
+        back = collect_pages(client, last_page['previous'], 'previous')
+        assert [title for page in reversed(back) for title in page] == (
+            titles[:-2]
+        ), (
+            'Проверьте, что ссылки `previous` в режиме курсора возвращают '
+            'предыдущие страницы.'
+        )
+
+    def test_02_titles_invalid_cursor(self, client):
+        response = client.get('/api/v1/titles/?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/` с некорректным '
+            'курсором возвращает ответ со статусом 404.'
+        )
+
+    def test_03_reviews_and_comments_cursor_walk(self, client):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, 7)
+        reviews = Review.objects.filter(title=title)
+        comments = Comment.objects.filter(review=review)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        for url, queryset in (
+            (reviews_url, reviews),
+            (f'{reviews_url}{review.id}/comments/', comments),
+        ):
+            queryset.update(pub_date=timezone.now())
+            pages = collect_pages(client, f'{url}?cursor=')
+            ids = [item['id'] for page in pages for item in page]
+            expected = sorted(queryset.values_list('id', flat=True),
+                              reverse=True)
+            assert ids == expected, (
+                f'Проверьте, что обход `{url}?cursor=` по ссылкам `next` '
+                'возвращает каждый объект ровно один раз в порядке '
+                '(pub_date, id) по убыванию.'
+            )
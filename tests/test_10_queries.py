@@ -0,0 +1,266 @@
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import title_list_cache
+from reviews.models import Comment, Review, Title
+from tests.utils import create_catalogue, create_discussion
+
+TITLES_QUERIES = 3
+TITLE_DETAIL_QUERIES = 2
+REVIEWS_QUERIES = 3
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10QueryBudget:
+
+    @pytest.mark.parametrize('size', (1, 5, 20))
+    def test_01_titles_list_queries(self, client, django_assert_num_queries,
+                                    size):
+        titles = create_catalogue(size)
+        with django_assert_num_queries(TITLES_QUERIES):
+            response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == min(size, 5)
+        with django_assert_num_queries(TITLES_QUERIES - 1):
+            client.get('/api/v1/titles/?cursor=')
+        with django_assert_num_queries(TITLE_DETAIL_QUERIES):
+            response = client.get(f'/api/v1/titles/{titles[-1].id}/')
+        assert response.json()['category']['slug'] == (
+            titles[-1].category.slug
+        ), (
+            'Проверьте, что GET-запрос к `/api/v1/titles/{title_id}/` '
+            'возвращает категорию произведения.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10TitleListCache:
+
+    def test_01_cache_hits_and_invalidation(self, client, monkeypatch,
+                                            django_assert_num_queries):
+        titles = create_catalogue(3)
+        url = '/api/v1/titles/?genre=genre-0&year=2000'
+        stats = title_list_cache.stats()
+        assert client.get(url)['X-Cache'] == 'MISS'
+
+        def no_writes(*args, **kwargs):
+            raise AssertionError(
+                'Проверьте, что попадание в кэш списка произведений не '
+                'пишет в общий кэш.')
+
+        with monkeypatch.context() as patch:
+            for method in ('add', 'set', 'incr'):
+                patch.setattr(cache, method, no_writes)
+            with django_assert_num_queries(0):
+                response = client.get(
+                    '/api/v1/titles/?year=2000&genre=genre-0')
+        assert response['X-Cache'] == 'HIT', (
+            'Проверьте, что повторный запрос списка произведений с теми же '
+            'фильтрами обслуживается из кэша.'
+        )
+        assert title_list_cache.stats() == {
+            'hits': stats['hits'] + 1, 'misses': stats['misses'] + 1
+        }
+
+        titles[0].category.name = 'Новая категория'
+        titles[0].category.save()
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert 'Новая категория' in [
+            title['category']['name'] for title in response.json()['results']
+        ], (
+            'Проверьте, что изменение категории сбрасывает кэш списка '
+            'произведений.'
+        )
+
+    def test_02_invalidation_across_processes(self, client):
+        create_catalogue(1)
+        url = '/api/v1/titles/'
+        client.get(url)
+        assert client.get(url)['X-Cache'] == 'HIT'
+        subprocess.run(
+            [sys.executable, '-c',
+             'import sys, django; from django.conf import settings; '
+             'settings.CACHES["default"]["LOCATION"] = sys.argv[1]; '
+             'django.setup(); '
+             'from api.cache import title_list_cache; '
+             'title_list_cache.invalidate()',
+             settings.CACHES['default']['LOCATION']],
+            cwd=settings.BASE_DIR, check=True,
+            env=dict(os.environ,
+                     DJANGO_SETTINGS_MODULE='api_yamdb.settings'),
+        )
+        assert client.get(url)['X-Cache'] == 'MISS', (
+            'Проверьте, что сброс кэша списка произведений в одном процессе '
+            'виден остальным процессам сервера.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ReviewQueryBudget:
+
+    @pytest.mark.parametrize('size', (1, 5, 20))
+    def test_01_reviews_and_comments_queries(self, client,
+                                             django_assert_num_queries,
+                                             size):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, size)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+
+        with django_assert_num_queries(REVIEWS_QUERIES):
+            response = client.get(reviews_url)
+        authors = {item['author'] for item in response.json()['results']}
+        assert len(authors) == min(size, 5), (
+            f'Проверьте, что ответ на GET-запрос к `{reviews_url}` '
+            'содержит имена авторов отзывов.'
+        )
+        with django_assert_num_queries(REVIEWS_QUERIES):
+            client.get(comments_url)
+        with django_assert_num_queries(REVIEWS_QUERIES - 1):
+            response = client.get(f'{reviews_url}{review.id}/')
+        assert response.json()['author'] == review.author.username
+
+    def test_02_review_create_queries(self, user_client, user,
+                                      django_assert_num_queries):
+        title = create_catalogue(1)[0]
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        data = {'text': 'Отзыв', 'score': 7}
+        # пользователь из токена, BEGIN, произведение, точка сохранения,
+        # вставка отзыва, сдвиг рейтинга и освобождение точки сохранения
+        with django_assert_num_queries(7):
+            response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+
+        response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что повторный POST-запрос пользователя к `{url}` '
+            'возвращает ответ со статусом 400.'
+        )
+        assert response.json() == {
+            'non_field_errors': ['Вы уже оставляли отзыв на это произведение']
+        }
+        title.refresh_from_db()
+        assert title.reviews_count == 1, (
+            'Проверьте, что отклонённый дубликат отзыва не меняет рейтинг '
+            'произведения.'
+        )
+
+    def test_03_review_integrity_error_not_duplicate(self, user_client,
+                                                     monkeypatch):
+        title = create_catalogue(1)[0]
+        url = f'/api/v1/titles/{title.id}/reviews/'
+
+        def fail(*args, **kwargs):
+            raise IntegrityError('NOT NULL constraint failed')
+
+        monkeypatch.setattr(Review, 'save', fail)
+        with pytest.raises(IntegrityError):
+            user_client.post(url, data={'text': 'Отзыв', 'score': 7})
+
+    @pytest.mark.parametrize('size', (1, 5, 20))
+    def test_04_comment_previews_queries(self, client,
+                                         django_assert_num_queries, size):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, size)
+        url = f'/api/v1/titles/{title.id}/reviews/?comments=3'
+
+        with django_assert_num_queries(REVIEWS_QUERIES + 2):
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        results = {item['id']: item for item in response.json()['results']}
+        expected = list(Comment.objects.filter(review=review).order_by(
+            '-pub_date', '-id').values_list('text', flat=True)[:3])
+        assert results[review.id]['comments_count'] == size + 1, (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'число комментариев к отзыву в поле `comments_count`.'
+        )
+        assert [comment['text'] for comment in results[review.id][
+            'latest_comments']] == expected, (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'последние комментарии к отзыву в поле `latest_comments`.'
+        )
+        assert 'comments_count' not in client.get(
+            f'/api/v1/titles/{title.id}/reviews/'
+        ).json()['results'][0]
+        assert client.get(
+            f'/api/v1/titles/{title.id}/reviews/?comments=100'
+        ).status_code == HTTPStatus.BAD_REQUEST
+
+    @pytest.mark.parametrize('size', (1, 5, 20))
+    def test_05_title_bundle_queries(self, client, django_assert_num_queries,
+                                     size):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, size)
+        Title.objects.filter(pk=title.pk).recalculate_rating()
+        url = f'/api/v1/titles/{title.id}/bundle/'
+
+        # произведение, жанры, отзывы, счётчики и последние комментарии
+        with django_assert_num_queries(5):
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` возвращает ответ со '
+            'статусом 200.'
+        )
+        data = response.json()
+        assert data['title']['id'] == title.id
+        assert data['title']['rating'] == 5
+        reviews = data['reviews']
+        assert reviews['count'] == size
+        assert len(reviews['results']) == min(size, 5)
+        assert (reviews['next'] is not None) == (size > 5), (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит ссылку '
+            'на следующую страницу отзывов.'
+        )
+        first = reviews['results'][0]
+        assert first['id'] == review.id
+        assert first['comments_count'] == size + 1
+        assert len(first['latest_comments']) == min(size + 1, 3)
+        if reviews['next']:
+            next_page = client.get(reviews['next']).json()
+            assert next_page['results'][0]['id'] not in [
+                item['id'] for item in reviews['results']
+            ]
+
+    @pytest.mark.parametrize('pk', ('abc', '100500'))
+    def test_06_title_bundle_not_found(self, client, pk):
+        url = f'/api/v1/titles/{pk}/bundle/'
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            f'Проверьте, что GET-запрос к `{url}` для несуществующего '
+            'произведения возвращает ответ со статусом 404.'
+        )
+
+    def test_07_comment_writes_read_review_once(self, user_client):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, 1)
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+
+        def review_reads(method, url, **kwargs):
+            with CaptureQueriesContext(connection) as context:
+                response = method(url, **kwargs)
+            return response, sum(
+                query['sql'].startswith('SELECT')
+                and 'FROM "reviews_review"' in query['sql']
+                for query in context.captured_queries)
+
+        response, reads = review_reads(
+            user_client.post, url, data={'text': 'Комментарий'})
+        assert response.status_code == HTTPStatus.CREATED
+        comment_url = f'{url}{response.json()["id"]}/'
+        response, patch_reads = review_reads(
+            user_client.patch, comment_url, data={'text': 'Правка'})
+        assert response.status_code == HTTPStatus.OK
+        response, delete_reads = review_reads(user_client.delete, comment_url)
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert (reads, patch_reads, delete_reads) == (1, 1, 1), (
+            'Проверьте, что при изменении комментария отзыв читается из '
+            'базы один раз.'
+        )
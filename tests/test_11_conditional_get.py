@@ -0,0 +1,118 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.cache import title_list_cache
+from tests.utils import (create_catalogue, create_comments,
+                         create_single_review)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ConditionalGet:
+
+    def check_not_modified(self, client, url, django_assert_num_queries):
+        response = client.get(url)
+        etag = response.get('ETag')
+        assert etag and response.get('Last-Modified'), (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'заголовки `ETag` и `Last-Modified`.'
+        )
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f'Проверьте, что GET-запрос к `{url}` с актуальным '
+            '`If-None-Match` возвращает ответ со статусом 304 без '
+            'обращений к базе данных.'
+        )
+        return etag
+
+    def test_01_reviews_and_comments(self, client, admin_client, admin,
+                                     user_client, user, moderator_client,
+                                     moderator, django_assert_num_queries):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        reviews_url = f'{title_url}reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+
+        title_etag = self.check_not_modified(
+            client, title_url, django_assert_num_queries)
+        reviews_etag = self.check_not_modified(
+            client, reviews_url, django_assert_num_queries)
+        comment_etag = self.check_not_modified(
+            client, f'{comments_url}{comments[0]["id"]}/',
+            django_assert_num_queries)
+
+        create_single_review(moderator_client, titles[0]['id'], 'Новый', 3)
+        for url, etag in ((title_url, title_etag),
+                          (reviews_url, reviews_etag)):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что после нового отзыва GET-запрос к `{url}` '
+                'со старым `If-None-Match` возвращает ответ со статусом 200.'
+            )
+        response = client.get(f'{comments_url}{comments[0]["id"]}/',
+                              HTTP_IF_NONE_MATCH=comment_etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        response = user_client.patch(
+            f'{comments_url}{comments[1]["id"]}/', data={'text': 'Правка'})
+        assert response.status_code == HTTPStatus.OK
+        response = client.get(f'{comments_url}{comments[0]["id"]}/',
+                              HTTP_IF_NONE_MATCH=comment_etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение комментария меняет `ETag` '
+            'комментариев отзыва.'
+        )
+
+    def test_02_title_list_cache(self, client, monkeypatch,
+                                 django_assert_num_queries):
+        create_catalogue(2)
+        url = '/api/v1/titles/'
+        client.get(url)
+        response = client.get(url)
+        assert response['X-Cache'] == 'HIT'
+        assert response.get('ETag') and response.get('Last-Modified'), (
+            'Проверьте, что ответ из кэша списка произведений содержит '
+            'заголовки `ETag` и `Last-Modified`.'
+        )
+        etag = self.check_not_modified(client, url, django_assert_num_queries)
+
+        # запись страницы истекла, а версия пространства имён — нет
+        monkeypatch.setattr(title_list_cache, 'get', lambda key: None)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что при промахе кэша списка произведений запрос с '
+            'актуальным `If-None-Match` возвращает ответ со статусом 304.'
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        assert response.status_code == HTTPStatus.OK
+        assert response['X-Cache'] == 'MISS'
+
+    def test_03_author_changes(self, client, admin_client, admin,
+                               user_client, user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client})
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(url)['ETag']
+
+        response = client.post('/api/v1/auth/signup/', data={
+            'username': 'newcomer', 'email': 'newcomer@yamdb.fake'})
+        assert response.status_code == HTTPStatus.OK
+        response = admin_client.patch(f'/api/v1/users/{user.username}/',
+                                      data={'bio': 'Новая биография'})
+        assert response.status_code == HTTPStatus.OK
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что регистрация пользователя и правка его профиля '
+            'без смены имени не меняют `ETag` списков отзывов.'
+        )
+
+        response = admin_client.patch(f'/api/v1/users/{user.username}/',
+                                      data={'username': 'renamed'})
+        assert response.status_code == HTTPStatus.OK
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что смена имени пользователя меняет `ETag` списков '
+            'отзывов.'
+        )
@@ -0,0 +1,112 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import (create_catalogue, create_single_review,
+                         create_titles)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12TitleSearch:
+
+    def test_01_titles_search(self, admin_client, client):
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        response = client.get(f'{url}?search=орешек')
+        assert response.status_code == HTTPStatus.OK
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id']
+        ], (
+            f'Проверьте, что GET-запрос к `{url}` с параметром `search` '
+            'находит произведения по словам из названия.'
+        )
+
+        response = client.get(f'{url}?search=back')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id']
+        ], (
+            f'Проверьте, что параметр `search` в `{url}` ищет и по '
+            'описанию произведения.'
+        )
+
+        response = client.get(
+            f'{url}?search=back&category={categories[1]["slug"]}')
+        assert response.json()['results'] == [], (
+            f'Проверьте, что параметр `search` в `{url}` сочетается с '
+            'фильтром по категории.'
+        )
+
+        admin_client.patch(f'{url}{titles[0]["id"]}/',
+                           data={'name': 'Хищник'})
+        response = client.get(f'{url}?search=терминатор')
+        assert response.json()['results'] == [], (
+            'Проверьте, что поисковый индекс обновляется при изменении '
+            'произведения.'
+        )
+        response = client.get(f'{url}?search=хищ&genre={genres[0]["slug"]}')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id']
+        ]
+
+        for params in ('search=хищ&cursor=', 'ordering=year&cursor='):
+            response = client.get(f'{url}?{params}')
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что GET-запрос к `{url}` отклоняет параметр '
+                '`cursor` вместе с параметрами, задающими свой порядок.'
+            )
+
+        admin_client.delete(f'{url}{titles[0]["id"]}/')
+        response = client.get(f'{url}?search=хищник')
+        assert response.json()['results'] == [], (
+            'Проверьте, что удалённые произведения не попадают в поиск.'
+        )
+
+    def test_02_reviews_search(self, client, user_client, moderator_client,
+                               admin_client):
+        titles = create_catalogue(2)
+        url = f'/api/v1/titles/{titles[0].id}/reviews/'
+        texts = (
+            (user_client, 'Саундтрек великолепен, саундтрек слушаю до сих '
+                          'пор'),
+            (moderator_client, 'Сюжет слабый, но саундтрек спасает'),
+            (admin_client, 'Скучно'),
+        )
+        reviews = [
+            create_single_review(author, titles[0].id, text, 5).json()
+            for author, text in texts
+        ]
+        create_single_review(user_client, titles[1].id, 'Саундтрек', 5)
+
+        response = client.get(f'{url}?search=саундтрек')
+        assert response.status_code == HTTPStatus.OK
+        assert [review['id'] for review in response.json()['results']] == [
+            reviews[0]['id'], reviews[1]['id']
+        ], (
+            f'Проверьте, что GET-запрос к `{url}` с параметром `search` '
+            'находит только отзывы этого произведения и упорядочивает их '
+            'по релевантности.'
+        )
+        response = client.get(f'{url}?search=сюж саунд')
+        assert [review['id'] for review in response.json()['results']] == [
+            reviews[1]['id']
+        ]
+        response = client.get(f'{url}?search=саундтрек&cursor=')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что GET-запрос к `{url}` отклоняет параметр '
+            '`cursor` вместе с `search`: курсор не сохраняет порядок по '
+            'релевантности.'
+        )
+
+        moderator_client.patch(f'{url}{reviews[1]["id"]}/',
+                               data={'text': 'Передумал'})
+        admin_client.delete(f'{url}{reviews[0]["id"]}/')
+        response = client.get(f'{url}?search=саундтрек')
+        assert response.json()['results'] == [], (
+            'Проверьте, что поисковый индекс отзывов обновляется при '
+            'изменении и удалении отзыва.'
+        )
+        response = client.get(f'{url}?search=передумал')
+        assert [review['id'] for review in response.json()['results']] == [
+            reviews[1]['id']
+        ]
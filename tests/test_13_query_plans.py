@@ -0,0 +1,158 @@
+import re
+from http import HTTPStatus
+from itertools import combinations
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.filters import TitleFilter
+from api.pagination import TitlePagination
+from api.views import TitlesViewSet
+from reviews.models import GenreTitle, Title
+from tests.utils import create_catalogue, create_discussion
+
+FILTER_VALUES = {
+    'category': 'category-0',
+    'genre': 'genre-0',
+    'name': 'Произведение 0',
+    'year': '2000',
+}
+FULL_SCAN = re.compile(r'^SCAN \S+$')
+SORT_STEP = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def query_plans(params):
+    with CaptureQueriesContext(connection) as context:
+        # порядок, в котором список отдаёт TitlesViewSet
+        queryset = TitlePagination().order_queryset(
+            TitleFilter(params, queryset=TitlesViewSet.queryset).qs)
+        queryset.count()
+        list(queryset[:5])
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            plans.append([row[-1] for row in cursor.fetchall()])
+    return plans
+
+
+def request_plan(client, url):
+    """План запроса страницы произведений при GET-запросе к url."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    sql = next(query['sql'] for query in context.captured_queries
+               if query['sql'].startswith('SELECT "reviews_title"'))
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return response, [row[-1] for row in cursor.fetchall()]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13QueryPlans:
+
+    @pytest.mark.parametrize('filters', [
+        combo
+        for size in range(len(FILTER_VALUES) + 1)
+        for combo in combinations(FILTER_VALUES, size)
+    ])
+    def test_01_title_filters_use_indexes(self, filters):
+        create_catalogue(3)
+        params = {name: FILTER_VALUES[name] for name in filters}
+        plans = query_plans(params)
+        if 'genre' in filters:
+            # произведения жанра читаются в порядке названия по копиям
+            # названий в строках жанра
+            assert any('genretitle_genre_name_idx' in step
+                       for plan in plans for step in plan), (
+                f'Проверьте индексы для фильтров {filters}: планы {plans} '
+                'не читают произведения жанра по индексу названий.'
+            )
+        for plan in plans:
+            if filters:
+                scans = [step for step in plan if step.startswith('SCAN ')]
+            else:
+                scans = [step for step in plan if FULL_SCAN.match(step)]
+            assert not scans, (
+                f'Проверьте индексы для фильтров {filters}: план запроса '
+                f'{plan} содержит полный просмотр таблицы.'
+            )
+            reads_titles = any('reviews_title ' in step for step in plan)
+            if reads_titles:
+                assert SORT_STEP not in plan, (
+                    f'Проверьте индексы для фильтров {filters}: план '
+                    f'запроса {plan} сортирует произведения без индекса.'
+                )
+
+    def test_02_comment_page_uses_index(self, client):
+        title = create_catalogue(1)[0]
+        review = create_discussion(title, 3)
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'EXPLAIN QUERY PLAN {context.captured_queries[-1]["sql"]}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        assert SORT_STEP not in plan and any(
+            'comment_review_pub_date_idx' in step for step in plan
+        ), (
+            f'Проверьте, что страница комментариев к отзыву читается по '
+            f'индексу (review, pub_date) без сортировки: {plan}.'
+        )
+
+        response = client.get(
+            f'/api/v1/titles/{title.id + 1}/reviews/{review.id}/comments/')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что комментарии к отзыву, запрошенные через чужое '
+            'произведение, возвращают ответ со статусом 404.'
+        )
+
+    def test_03_top_titles_use_indexes(self, client):
+        titles = create_catalogue(6)
+        for index, title in enumerate(titles):
+            Title.objects.filter(pk=title.pk).update(
+                rating=index % 4, reviews_count=3)
+        assert sorted(GenreTitle.objects.values_list(
+            'title_id', 'rating')) == sorted(
+            (title.pk, index % 4) for index, title in enumerate(titles)
+            for _ in range(index % 3 + 1)
+        ), (
+            'Проверьте, что рейтинг в строках жанров следует за рейтингом '
+            'произведения.'
+        )
+        Title.objects.filter(pk=titles[2].pk).update(name='Новое')
+        assert set(GenreTitle.objects.filter(title=titles[2]).values_list(
+            'title_name', flat=True)) == {'Новое'}, (
+            'Проверьте, что название в строках жанров следует за '
+            'названием произведения.'
+        )
+        expected = {
+            '': range(6),
+            'category=category-1': (1,),
+            'genre=genre-1': (1, 2, 4, 5),
+            'genre=genre-1&category=category-1': (1,),
+        }
+        for params, indexes in expected.items():
+            url = f'/api/v1/titles/top/?{params}&cursor='
+            found = []
+            while url:
+                response, plan = request_plan(client, url)
+                assert SORT_STEP not in plan, (
+                    f'Проверьте, что `/api/v1/titles/top/?{params}` читает '
+                    f'произведения в порядке индекса: {plan}.'
+                )
+                if 'genre' in params:
+                    assert any('genretitle_genre_rating_idx' in step
+                               for step in plan), (
+                        f'Проверьте, что лучшие произведения жанра читаются '
+                        f'по индексу рейтинга в строках жанра: {plan}.'
+                    )
+                found += [title['id'] for title in response.json()['results']]
+                url = response.json()['next']
+            assert found == [
+                titles[index].pk for index in
+                sorted(indexes, key=lambda index: (-(index % 4), index))
+            ], params
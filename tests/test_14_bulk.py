@@ -0,0 +1,206 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review, Title
+from tests.utils import (create_catalogue, create_categories, create_genre,
+                         create_single_review, create_titles)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14BulkCreate:
+
+    def test_01_titles_bulk(self, admin_client, user_client, client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        url = '/api/v1/titles/bulk/'
+
+        def make_titles(count):
+            return [{
+                'name': f'Произведение {idx}',
+                'year': 1990 + idx,
+                'genre': [genres[idx % 3]['slug'], genres[0]['slug']],
+                'category': categories[idx % 2]['slug'],
+            } for idx in range(count)]
+
+        response = user_client.post(url, data=make_titles(1), format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что POST-запрос пользователя к `{url}` возвращает '
+            'ответ со статусом 403.'
+        )
+
+        query_counts = []
+        for count in (2, 20):
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.post(url, data=make_titles(count),
+                                             format='json')
+            assert response.status_code == HTTPStatus.CREATED, (
+                f'Если POST-запрос администратора к `{url}` содержит '
+                'корректный список - должен вернуться ответ со статусом 201.'
+            )
+            assert len(response.json()['created']) == count
+            query_counts.append(len(context.captured_queries))
+        assert query_counts[0] == query_counts[1], (
+            f'Проверьте, что число запросов к базе при POST-запросе к '
+            f'`{url}` не зависит от размера пакета.'
+        )
+
+        created = response.json()['created'][3]
+        detail = client.get(f'/api/v1/titles/{created["id"]}/').json()
+        assert detail['name'] == created['name']
+        assert sorted(genre['slug'] for genre in detail['genre']) == sorted(
+            created['genre'])
+        assert client.get('/api/v1/titles/').json()['count'] == 22, (
+            'Проверьте, что массовое создание сбрасывает кэш списка '
+            'произведений.'
+        )
+
+        data = make_titles(3)
+        data[0]['genre'] = ['unknown']
+        data[2]['year'] = 'дветыщи'
+        response = admin_client.post(url, data=data, format='json')
+        assert response.status_code == HTTPStatus.CREATED
+        assert [error['index'] for error in response.json()['errors']] == [
+            0, 2
+        ], (
+            f'Проверьте, что ответ на POST-запрос к `{url}` содержит '
+            'ошибки по каждому некорректному элементу.'
+        )
+        assert len(response.json()['created']) == 1
+
+        response = admin_client.post(url, data={'name': 'x'}, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_02_reviews_batch(self, admin_client, user_client, client,
+                              user):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/reviews/batch/'
+        create_single_review(user_client, titles[1]['id'], 'Было', 2)
+
+        response = client.post(url, data=[],
+                               content_type='application/json')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            f'Проверьте, что POST-запрос анонима к `{url}` возвращает ответ '
+            'со статусом 401.'
+        )
+
+        data = [
+            {'title': titles[0]['id'], 'text': 'Хорошо', 'score': 8},
+            {'title': titles[1]['id'], 'text': 'Повтор', 'score': 5},
+            {'title': 100500, 'text': 'Нет такого', 'score': 5},
+            {'title': titles[0]['id'], 'text': 'Ещё раз', 'score': 1},
+            {'title': titles[0]['id'], 'text': 'Плохая оценка', 'score': 11},
+        ]
+        response = user_client.post(url, data=data, format='json')
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Если POST-запрос пользователя к `{url}` содержит корректные '
+            'отзывы - должен вернуться ответ со статусом 201.'
+        )
+        result = response.json()
+        assert [review['title'] for review in result['created']] == [
+            titles[0]['id']
+        ]
+        assert result['created'][0]['author'] == user.username
+        assert [error['index'] for error in result['errors']] == [
+            1, 2, 3, 4
+        ], (
+            f'Проверьте, что ответ на POST-запрос к `{url}` содержит ошибки '
+            'по несуществующим произведениям, повторным отзывам и '
+            'некорректным оценкам.'
+        )
+
+        response = user_client.post(url, data=data[:1], format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        assert client.get(title_url).json()['rating'] == 8, (
+            f'Проверьте, что POST-запрос к `{url}` обновляет рейтинг '
+            'произведения.'
+        )
+        reviews = client.get(f'{title_url}reviews/').json()
+        assert reviews['count'] == 1, (
+            f'Проверьте, что POST-запрос к `{url}` сбрасывает кэш отзывов.'
+        )
+
+    def test_03_reviews_batch_queries(self, admin_client, user_client):
+        titles = create_catalogue(12)
+        url = '/api/v1/reviews/batch/'
+        query_counts = []
+        for batch in (titles[:2], titles[2:]):
+            data = [{'title': title.id, 'text': 'Ок', 'score': 7}
+                    for title in batch]
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.post(url, data=data, format='json')
+            assert response.status_code == HTTPStatus.CREATED
+            assert len(response.json()['created']) == len(batch)
+            # одно обновление агрегатов на каждое произведение
+            query_counts.append(len(context.captured_queries) - len(batch))
+        assert query_counts[0] == query_counts[1], (
+            f'Проверьте, что проверка и вставка отзывов при POST-запросе '
+            f'к `{url}` выполняются фиксированным числом запросов.'
+        )
+        assert {title.reviews_count for title in Title.objects.all()} == {1}
+
+    def test_04_ids_under_write_lock(self, admin_client, user_client):
+        titles = create_catalogue(2)
+        data = [{'title': title.id, 'text': 'Ок', 'score': 7}
+                for title in titles]
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post('/api/v1/reviews/batch/',
+                                        data=data, format='json')
+        assert response.status_code == HTTPStatus.CREATED
+        queries = [query['sql'] for query in context.captured_queries]
+        last_id = next(index for index, sql in enumerate(queries)
+                       if 'MAX(' in sql)
+        assert queries[last_id - 1].startswith('UPDATE "reviews_review"'), (
+            'Проверьте, что пакетная вставка отзывов берёт блокировку '
+            'записи до чтения последнего id.'
+        )
+
+    def test_05_titles_bulk_limit(self, settings, admin_client):
+        settings.BULK_MAX_ITEMS = 2
+        categories = create_categories(admin_client)
+        url = '/api/v1/titles/bulk/'
+        data = [{'name': f'Произведение {idx}', 'year': 2000,
+                 'category': categories[0]['slug']} for idx in range(3)]
+
+        response = admin_client.post(url, data=data, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что POST-запрос к `{url}` с пакетом длиннее '
+            'BULK_MAX_ITEMS возвращает ответ со статусом 400.'
+        )
+        assert not Title.objects.exists()
+        response = admin_client.post(url, data=data[:2], format='json')
+        assert response.status_code == HTTPStatus.CREATED
+
+    def test_06_ids_not_reused(self, admin_client):
+        categories = create_categories(admin_client)
+        url = '/api/v1/titles/bulk/'
+        data = [{'name': f'Произведение {idx}', 'year': 2000,
+                 'category': categories[0]['slug']} for idx in range(2)]
+
+        response = admin_client.post(url, data=data, format='json')
+        last_id = response.json()['created'][-1]['id']
+        Title.objects.filter(pk=last_id).delete()
+        response = admin_client.post(url, data=data[:1], format='json')
+        assert response.json()['created'][0]['id'] > last_id, (
+            f'Проверьте, что POST-запрос к `{url}` не выдаёт повторно id '
+            'удалённого произведения.'
+        )
+
+    def test_07_reviews_batch_limit(self, settings, user_client):
+        settings.BULK_MAX_ITEMS = 2
+        titles = create_catalogue(3)
+        url = '/api/v1/reviews/batch/'
+        data = [{'title': title.id, 'text': 'Ок', 'score': 7}
+                for title in titles]
+
+        response = user_client.post(url, data=data, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что POST-запрос к `{url}` с пакетом длиннее '
+            'BULK_MAX_ITEMS возвращает ответ со статусом 400.'
+        )
+        assert not Review.objects.exists()
+        response = user_client.post(url, data=data[:2], format='json')
+        assert response.status_code == HTTPStatus.CREATED
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from api.events import OVERFLOW, event_hub
+from api_yamdb.asgi import application
+from tests.utils import create_catalogue
+
+
+def stream_scope(title_id):
+    return {
+        'type': 'http', 'method': 'GET', 'scheme': 'http',
+        'path': f'/api/v1/titles/{title_id}/events/', 'query_string': b'',
+        'headers': [], 'server': ('testserver', 80),
+    }
+
+
+async def open_stream(title_id):
+    """Запускает поток событий; возвращает задачу, список отправленных
+    сообщений и функцию отключения клиента."""
+    sent = []
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    task = asyncio.ensure_future(
+        application(stream_scope(title_id), receive, send))
+    for _ in range(200):
+        if event_hub.count(title_id) or task.done():
+            break
+        await asyncio.sleep(0.01)
+    return task, sent, disconnected.set
+
+
+async def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+def parse_events(sent):
+    events = []
+    for message in sent:
+        chunk = message.get('body', b'').decode()
+        if chunk.startswith('event: '):
+            event, data = chunk.strip().split('\n')
+            events.append((event[len('event: '):],
+                           json.loads(data[len('data: '):])))
+    return events
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15TitleEvents:
+
+    def test_01_review_and_comment_events(self, user_client):
+        title, other = create_catalogue(2)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+
+        async def scenario():
+            task, sent, disconnect = await open_stream(title.id)
+            post = sync_to_async(user_client.post)
+            await post(f'/api/v1/titles/{other.id}/reviews/',
+                       data={'text': 'Чужой', 'score': 3})
+            review = (await post(reviews_url,
+                                 data={'text': 'Саундтрек', 'score': 9}))
+            await post(f'{reviews_url}{review.json()["id"]}/comments/',
+                       data={'text': 'Согласен'})
+            await wait_for(lambda: len(parse_events(sent)) >= 2)
+            disconnect()
+            await asyncio.wait_for(task, 1)
+            return sent, review.json()
+
+        sent, review = asyncio.run(scenario())
+        assert sent[0]['status'] == 200
+        assert (b'content-type', b'text/event-stream') in sent[0]['headers']
+        events = parse_events(sent)
+        assert [event for event, _ in events] == ['review', 'comment'], (
+            'Проверьте, что поток `/api/v1/titles/{title_id}/events/` '
+            'передаёт события о новых отзывах и комментариях только своего '
+            'произведения.'
+        )
+        assert events[0][1] == review
+        assert events[1][1]['text'] == 'Согласен'
+        assert event_hub.count(title.id) == 0, (
+            'Проверьте, что после отключения клиента подписка удаляется.'
+        )
+
+    def test_02_unknown_title(self):
+        async def scenario():
+            task, sent, _ = await open_stream(100500)
+            await asyncio.wait_for(task, 1)
+            return sent
+
+        assert asyncio.run(scenario())[0]['status'] == 404
+
+    def test_03_bounded_queue(self, settings):
+        settings.EVENTS_QUEUE_SIZE = 3
+
+        async def scenario():
+            subscription = event_hub.subscribe(1)
+            try:
+                for number in range(10):
+                    event_hub.publish(1, 'review', {'id': number})
+                await asyncio.sleep(0)
+                return subscription.queue.qsize(), await subscription.get()
+            finally:
+                event_hub.unsubscribe(subscription)
+
+        size, message = asyncio.run(scenario())
+        assert size == 1 and message is OVERFLOW, (
+            'Проверьте, что при переполнении очереди подписчика события '
+            'отбрасываются и поток закрывается.'
+        )
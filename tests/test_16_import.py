@@ -0,0 +1,325 @@
+import csv
+import os
+import shutil
+import tracemalloc
+from datetime import datetime, timezone
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from reviews.management.commands.import_csv_to_db import Command
+from reviews.models import (Comment, Genre, GenreTitle, ImportedRow, Review,
+                            Title)
+from users.models import User
+
+
+def read_csv(data_dir, file_name):
+    with open(data_dir / file_name, encoding='utf-8') as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def write_csv(data_dir, file_name, rows):
+    with open(data_dir / file_name, 'w', encoding='utf-8',
+              newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Копия static/data, которую тест может менять."""
+    path = tmp_path / 'data'
+    shutil.copytree(settings.BASE_DIR / 'static' / 'data', path)
+    return path
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16ImportCsv:
+
+    def test_01_import(self, data_dir, client):
+        stdout = StringIO()
+        call_command('import_csv_to_db', data_dir=data_dir, batch_size=7,
+                     workers=2, stdout=stdout)
+        output = stdout.getvalue()
+        assert ('Порядок загрузки: category.csv, genre.csv, users.csv -> '
+                'titles.csv -> genre_title.csv, review.csv -> comments.csv'
+                ) in output, (
+            'Проверьте, что команда `import_csv_to_db` строит порядок '
+            'загрузки по внешним ключам между файлами.'
+        )
+        assert 'Пиковое потребление памяти' in output, (
+            'Проверьте, что команда `import_csv_to_db` сообщает о '
+            'потреблении памяти.'
+        )
+
+        for model, file_name in (
+            (Title, 'titles.csv'), (Genre, 'genre.csv'),
+            (GenreTitle, 'genre_title.csv'), (User, 'users.csv'),
+            (Review, 'review.csv'), (Comment, 'comments.csv'),
+        ):
+            ids = {int(row['id']) for row in read_csv(data_dir, file_name)}
+            assert set(model.objects.values_list('id', flat=True)) == ids, (
+                'Проверьте, что команда `import_csv_to_db` загружает все '
+                f'строки {file_name} с первичными ключами из CSV.'
+            )
+
+        row = read_csv(data_dir, 'review.csv')[0]
+        review = Review.objects.get(pk=row['id'])
+        assert review.pub_date == datetime.fromisoformat(
+            row['pub_date'].replace('Z', '+00:00')
+        ).astimezone(timezone.utc), (
+            'Проверьте, что команда `import_csv_to_db` сохраняет даты '
+            'публикации из CSV.'
+        )
+        title = Title.objects.get(pk=row['title_id'])
+        assert title.reviews_count == title.reviews.count(), (
+            'Проверьте, что после загрузки пересчитываются агрегаты '
+            'рейтинга произведений.'
+        )
+        assert not GenreTitle.objects.exclude(
+            rating=F('title__rating')).exclude(title__rating=None).exists()
+        assert GenreTitle.objects.filter(rating=None).count() == (
+            GenreTitle.objects.filter(title__rating=None).count()), (
+            'Проверьте, что после загрузки в строках жанров заполняется '
+            'рейтинг произведения.'
+        )
+
+        response = client.get('/api/v1/titles/?search=шоушенк')
+        assert [item['id'] for item in response.json()['results']] == [1], (
+            'Проверьте, что после загрузки перестраивается поисковый индекс.'
+        )
+
+    @pytest.mark.parametrize('workers', (0, 2))
+    def test_02_invalid_row(self, data_dir, workers):
+        rows = read_csv(data_dir, 'review.csv')
+        rows[3]['score'] = '11'
+        write_csv(data_dir, 'review.csv', rows)
+
+        with pytest.raises(CommandError, match='review.csv, запись 4'):
+            call_command('import_csv_to_db', data_dir=data_dir,
+                         batch_size=2, workers=workers, stdout=StringIO())
+        assert Review.objects.count() == 2, (
+            'Проверьте, что команда `import_csv_to_db` проверяет и '
+            'записывает файл пакетами, не читая его целиком.'
+        )
+
+    def test_03_dangling_references(self, data_dir):
+        reviews = read_csv(data_dir, 'review.csv')
+        reviews[0]['title_id'] = '999'
+        reviews[1]['title_id'] = '999'
+        reviews[2]['author'] = '4242'
+        write_csv(data_dir, 'review.csv', reviews)
+        skipped = {reviews[index]['id'] for index in range(3)}
+        orphans = [row for row in read_csv(data_dir, 'comments.csv')
+                   if row['review_id'] in skipped]
+
+        stdout = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('import_csv_to_db', data_dir=data_dir,
+                         stdout=stdout)
+        output = stdout.getvalue()
+        assert ('review.csv: пропущено 3 записей со ссылками на '
+                'отсутствующие объекты: title_id=999 (2), author=4242 (1)'
+                ) in output, (
+            'Проверьте, что команда `import_csv_to_db` пропускает строки со '
+            'ссылками на отсутствующие объекты и сообщает о них сводкой.'
+        )
+        assert Review.objects.count() == len(reviews) - 3
+        assert Comment.objects.count() == (
+            len(read_csv(data_dir, 'comments.csv')) - len(orphans))
+        selects = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('SELECT')
+                   and 'sqlite_master' not in query['sql']]
+        # по одному запросу id на каждую таблицу, на которую есть ссылки:
+        # категории, жанры, произведения, пользователи и отзывы
+        assert len(selects) <= 5, (
+            'Проверьте, что команда `import_csv_to_db` проверяет внешние '
+            'ключи в памяти, без запросов на каждую строку.'
+        )
+
+    def test_04_incremental(self, data_dir, client):
+        call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                     checksums=True, stdout=StringIO())
+        with pytest.raises(CommandError, match='--incremental'):
+            call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                         stdout=StringIO())
+
+        author, api_author = (
+            User.objects.create(username=username,
+                                email=f'{username}@yamdb.fake')
+            for username in ('new-author', 'api-author'))
+        reviews = read_csv(data_dir, 'review.csv')
+        changed = reviews[0]
+        # удалённый отзыв другого произведения: кэш произведения changed
+        # сбрасывает только сама команда, а не сигналы удаления
+        removed = reviews.pop(next(
+            index for index, row in enumerate(reviews)
+            if row['title_id'] != changed['title_id']))
+        changed['text'] = 'Новый текст'
+        changed['score'] = '1'
+        added = dict(changed, id='1000', author=str(author.pk))
+        reviews.append(added)
+        write_csv(data_dir, 'review.csv', reviews)
+        comments = [row for row in read_csv(data_dir, 'comments.csv')
+                    if row['review_id'] != removed['id']]
+        write_csv(data_dir, 'comments.csv', comments)
+        reviews_url = f'/api/v1/titles/{changed["title_id"]}/reviews/'
+        etag = client.get(reviews_url)['ETag']
+        client.get('/api/v1/titles/')
+        api_review = Review.objects.create(
+            title_id=removed['title_id'], author=api_author,
+            text='Не из выгрузки', score=5)
+
+        stdout = StringIO()
+        call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                     incremental=True, delete_missing=True, stdout=stdout)
+        output = stdout.getvalue()
+        assert (f'review.csv: добавлено 1, изменено 1, без изменений '
+                f'{len(reviews) - 2} записей') in output, (
+            'Проверьте, что команда `import_csv_to_db --incremental` '
+            'пропускает строки с прежней контрольной суммой.'
+        )
+        assert 'users.csv: добавлено 0, изменено 0' in output
+        review = Review.objects.get(pk=changed['id'])
+        assert (review.text, review.score) == ('Новый текст', 1)
+        assert Review.objects.filter(pk=added['id']).exists()
+        response = client.get(reviews_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что загрузка изменений сбрасывает `ETag` списков '
+            'отзывов затронутых произведений.'
+        )
+        assert client.get('/api/v1/titles/')['X-Cache'] == 'MISS', (
+            'Проверьте, что загрузка изменений сбрасывает кэш списка '
+            'произведений.'
+        )
+        response = client.get(
+            f'/api/v1/titles/{changed["title_id"]}/reviews/?search=новый')
+        assert {item['id'] for item in response.json()['results']} == {
+            int(changed['id']), int(added['id'])}, (
+            'Проверьте, что поисковый индекс отзывов обновляется при '
+            'загрузке изменений.'
+        )
+        assert not Review.objects.filter(pk=removed['id']).exists(), (
+            'Проверьте, что с --delete-missing удаляются строки, которых '
+            'нет в новой выгрузке.'
+        )
+        assert Review.objects.filter(pk=api_review.pk).exists(), (
+            'Проверьте, что --delete-missing не удаляет строки, созданные '
+            'не импортом.'
+        )
+        for title_id in {changed['title_id'], removed['title_id']}:
+            title = Title.objects.get(pk=title_id)
+            assert title.reviews_count == title.reviews.count()
+            assert title.score_sum == sum(
+                title.reviews.values_list('score', flat=True)), (
+                'Проверьте, что после загрузки изменений пересчитывается '
+                'рейтинг затронутых произведений.'
+            )
+
+    def test_05_resume(self, data_dir, client, monkeypatch):
+        write_batch = Command.write_batch
+        written = []
+
+        def crash(self, table, imported, values):
+            if table.file_name == 'review.csv' and len(written) == 2:
+                raise RuntimeError('Сбой')
+            if table.file_name == 'review.csv':
+                written.append(len(values))
+            write_batch(self, table, imported, values)
+
+        monkeypatch.setattr(Command, 'write_batch', crash)
+        with pytest.raises(RuntimeError):
+            call_command('import_csv_to_db', data_dir=data_dir,
+                         batch_size=2, workers=0, stdout=StringIO())
+        monkeypatch.setattr(Command, 'write_batch', write_batch)
+        assert Review.objects.count() == 4
+
+        path = data_dir / 'review.csv'
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with pytest.raises(CommandError, match='файл изменился'):
+            call_command('import_csv_to_db', data_dir=data_dir,
+                         batch_size=2, workers=0, resume=True,
+                         stdout=StringIO())
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        reviews = read_csv(data_dir, 'review.csv')
+        stdout = StringIO()
+        call_command('import_csv_to_db', data_dir=data_dir, batch_size=2,
+                     workers=0, resume=True, stdout=stdout)
+        output = stdout.getvalue()
+        assert 'category.csv: загружен ранее, пропущен' in output
+        assert (f'review.csv: продолжение с записи 5 (id {reviews[3]["id"]})'
+                ) in output
+        assert f'review.csv: загружено {len(reviews) - 4} записей' in output, (
+            'Проверьте, что команда `import_csv_to_db --resume` продолжает '
+            'файл с последнего записанного пакета.'
+        )
+        assert set(Review.objects.values_list('id', flat=True)) == {
+            int(row['id']) for row in reviews}
+        assert Comment.objects.count() == len(
+            read_csv(data_dir, 'comments.csv'))
+        title = Title.objects.get(pk=reviews[0]['title_id'])
+        assert title.reviews_count == title.reviews.count()
+        response = client.get('/api/v1/titles/?search=шоушенк')
+        assert [item['id'] for item in response.json()['results']] == [1]
+
+        stdout = StringIO()
+        call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                     resume=True, stdout=stdout)
+        assert 'comments.csv: загружен ранее, пропущен' in stdout.getvalue()
+
+    def test_06_lazy_checksums(self, data_dir):
+        call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                     stdout=StringIO())
+        assert not ImportedRow.objects.exists(), (
+            'Проверьте, что полная загрузка без `--checksums` не сохраняет '
+            'контрольные суммы строк.'
+        )
+        count = len(read_csv(data_dir, 'review.csv'))
+        for expected in (f'изменено {count}, без изменений 0',
+                         f'изменено 0, без изменений {count}'):
+            stdout = StringIO()
+            call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                         incremental=True, stdout=stdout)
+            assert f'review.csv: добавлено 0, {expected}' in (
+                stdout.getvalue()), (
+                'Проверьте, что первая загрузка изменений после полной '
+                'загрузки без сумм сохраняет их.'
+            )
+
+    def test_07_huge_ids(self, data_dir):
+        huge = 10 ** 15
+        reviews = read_csv(data_dir, 'review.csv')
+        comments = [dict(row, review_id=str(huge))
+                    if row['review_id'] == reviews[0]['id'] else row
+                    for row in read_csv(data_dir, 'comments.csv')]
+        reviews[0]['id'] = str(huge)
+        reviews[1]['title_id'] = str(huge)
+        write_csv(data_dir, 'review.csv', reviews)
+        write_csv(data_dir, 'comments.csv', comments)
+
+        stdout = StringIO()
+        tracemalloc.start()
+        try:
+            call_command('import_csv_to_db', data_dir=data_dir, workers=0,
+                         stdout=stdout)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < 64 * 2 ** 20, (
+            'Проверьте, что большие id не раздувают множество известных '
+            'id команды `import_csv_to_db`.'
+        )
+        assert (f'title_id={huge} (1)') in stdout.getvalue()
+        assert Review.objects.filter(pk=huge).exists()
+        assert Comment.objects.filter(review_id=huge).count() == sum(
+            row['review_id'] == str(huge) for row in comments)
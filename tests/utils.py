@@ -1,5 +1,8 @@
 from http import HTTPStatus
 
+from reviews.models import Category, Comment, Genre, Review, Title
+from users.models import User
+
 check_name_and_slug_patterns = (
     (
         {
@@ -304,3 +307,34 @@ def check_fields(obj_type, url_pattern, obj, expected_data, detail=False):
         f'данные {obj_types[obj_type]}{results_in_msg}. Поле `id` не '
         'найдено или не является целым числом.'
     )
+
+
+def create_catalogue(size):
+    genres = [
+        Genre.objects.create(name=f'Жанр {idx}', slug=f'genre-{idx}')
+        for idx in range(3)
+    ]
+    titles = []
+    for idx in range(size):
+        category = Category.objects.create(
+            name=f'Категория {idx}', slug=f'category-{idx}')
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category)
+        title.genre.set(genres[:idx % 3 + 1])
+        titles.append(title)
+    return titles
+
+
+def create_discussion(title, size):
+    review = None
+    for idx in range(size):
+        author = User.objects.create(
+            username=f'author{idx}', email=f'author{idx}@yamdb.fake')
+        review = Review.objects.create(
+            title=title, author=author, text=f'Отзыв {idx}', score=5)
+        Comment.objects.create(
+            review=review, author=author, text=f'Комментарий {idx}')
+    for idx in range(size):
+        Comment.objects.create(review=review, author_id=review.author_id,
+                               text=f'Ответ {idx}')
+    return review